@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from websocket.asr_backend import ASR_BACKEND
 from websocket.handlers import websocket_endpoint
 
 app = FastAPI()
@@ -12,4 +13,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def warm_asr_pool():
+    if ASR_BACKEND == "deepgram":
+        from websocket.deepgram_client import asr_pool
+        asr_pool.start()
+
+@app.on_event("shutdown")
+async def drain_asr_pool():
+    if ASR_BACKEND == "deepgram":
+        from websocket.deepgram_client import asr_pool
+        await asr_pool.close()
+
 app.websocket("/ws")(websocket_endpoint)
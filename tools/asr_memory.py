@@ -0,0 +1,96 @@
+"""Long-session memory check for the bounded Deepgram live connection.
+
+    python -m tools.asr_memory [--responses 2000 20000] [--tolerance-mb 8] [--stock]
+
+Each run streams audio through a `BoundedLiveTranscription` to an
+in-process `tools.deepgram_standin` server until that many responses have
+come back, in a fresh interpreter, and reports its peak RSS. The check
+fails if peak RSS grows by more than the tolerance between the shortest
+and the longest run, i.e. if memory is not flat in session length.
+--stock runs the SDK's own LiveTranscription instead, for comparison.
+"""
+from deepgram.transcription import LiveTranscription
+from tools.deepgram_standin import StandinServer
+from websocket.deepgram_client import LIVE_OPTIONS, BoundedLiveTranscription
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import websockets
+
+# Audio bytes per response: the stand-in reveals one word, and sends one result, per chunk
+_CHUNK_BYTES = 320
+_UTTERANCE = "to be or not to be that is the question whether tis nobler in the mind to suffer the slings and arrows".split()
+
+
+async def stream(responses: int, stock: bool) -> dict:
+    # The same utterance list repeated, so the transcript itself doesn't grow with the run
+    transcript = [_UTTERANCE] * (responses // len(_UTTERANCE) + 1)
+    server = StandinServer(transcript, bytes_per_word=_CHUNK_BYTES, latency_ms=0, error_rate=0.0, seed=0)
+    async with websockets.serve(server.handle, "127.0.0.1", 0) as listener:
+        port = listener.sockets[0].getsockname()[1]
+        options = {"api_key": "0" * 40, "api_url": f"http://127.0.0.1:{port}"}
+        live_class = LiveTranscription if stock else BoundedLiveTranscription
+        connection = await live_class(options, LIVE_OPTIONS, "/listen")()
+
+        received = 0
+
+        def on_result(response):
+            nonlocal received
+            received += 1
+
+        connection.register_handler(connection.event.TRANSCRIPT_RECEIVED, on_result)
+        for sent in range(responses):
+            # Paced like the session's audio sender, so the bounded queue never drops audio
+            while connection._queue.qsize() > 8:
+                await asyncio.sleep(0.001)
+            connection.send(b"\0" * _CHUNK_BYTES)
+            if sent % 200 == 0:
+                await asyncio.sleep(0)
+        while received < responses:
+            await asyncio.sleep(0.01)
+
+        gc.collect()
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        kept = len(connection.received)
+        await connection.finish()
+    return {"responses": received, "kept": kept, "peak_rss_mb": round(peak_mb, 1)}
+
+
+def run_child(responses: int, stock: bool) -> dict:
+    command = [sys.executable, "-m", "tools.asr_memory", "--child", str(responses)] + (["--stock"] if stock else [])
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--responses", type=int, nargs="+", default=[2000, 20000], help="session lengths to compare")
+    parser.add_argument("--tolerance-mb", type=float, default=8.0, help="allowed peak RSS growth from the shortest run to the longest")
+    parser.add_argument("--stock", action="store_true", help="use the SDK's unbounded LiveTranscription")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            result = asyncio.run(stream(args.child, args.stock))
+        print(json.dumps(result))
+        return
+
+    runs = [run_child(n, args.stock) for n in sorted(args.responses)]
+    for run in runs:
+        print(f"{run['responses']:>8} responses: peak RSS {run['peak_rss_mb']:.1f} MB, {run['kept']} kept on the connection")
+    growth = runs[-1]["peak_rss_mb"] - runs[0]["peak_rss_mb"]
+    if growth > args.tolerance_mb:
+        print(f"❌ Peak RSS grew {growth:.1f} MB with session length (tolerance {args.tolerance_mb:g} MB)")
+        sys.exit(1)
+    print(f"✅ Peak RSS flat within {growth:.1f} MB (tolerance {args.tolerance_mb:g} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Local stand-in for the part of Deepgram's live /listen websocket API that Recallr uses.
+
+Plays a transcript back as interim and final results, paced by the audio
+bytes received, so the real SDK code path (connection, pool, keep-alives,
+bounded queue) can be load- and latency-tested without the service:
+
+    python -m tools.deepgram_standin --transcript lines.txt --port 8765
+    DEEPGRAM_API_URL=http://127.0.0.1:8765 DEEPGRAM_API_KEY=<any 40 hex chars> uvicorn main:app
+
+Each line of the transcript is one utterance, and every connection starts
+from the top. Binary frames are audio; KeepAlive is accepted and counted;
+CloseStream flushes the open utterance as a final, sends the metadata
+message with the sha256 of the audio, and closes the socket. With
+--drop-after the server hangs up after that many audio frames, as a
+connection lost mid-session would.
+"""
+from urllib.parse import parse_qs, urlparse
+from websocket.fake_asr import FakeBackend
+import argparse
+import asyncio
+import json
+import time
+import websockets
+
+
+def load_transcript(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [line.split() for line in f if line.strip()]
+
+
+class StandinServer:
+    def __init__(self, transcript, bytes_per_word: int, latency_ms: int, error_rate: float, seed: int, drop_after: int = 0):
+        self.transcript = transcript
+        self.bytes_per_word = bytes_per_word
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self.drop_after = drop_after
+        self.connections = 0
+
+    async def handle(self, ws, path: str = None):
+        path = path or ws.path
+        self.connections += 1
+        number = self.connections
+        params = parse_qs(urlparse(path).query)
+        print(f"🔌 #{number} connected: {path.split('?')[0]} {params}")
+
+        outgoing = asyncio.Queue()
+        fake = FakeBackend(outgoing.put_nowait, self.transcript, latency_ms=self.latency_ms,
+                           bytes_per_word=self.bytes_per_word, error_rate=self.error_rate, drop_after=self.drop_after, seed=self.seed)
+        sender = asyncio.create_task(self._send(ws, outgoing))
+        keep_alives = 0
+        started = time.monotonic()
+        try:
+            async for message in ws:
+                if isinstance(message, bytes):
+                    fake.send_audio(message)
+                    if fake.done:
+                        break  # dropped: hang up without the closing metadata
+                    continue
+                kind = json.loads(message).get("type")
+                if kind == "KeepAlive":
+                    keep_alives += 1
+                elif kind == "CloseStream":
+                    await fake.finish()
+                    break
+            if not ws.closed:
+                await outgoing.join()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            await ws.close()
+        print(f"🔚 #{number} closed after {time.monotonic() - started:.1f}s: {fake.stats()}, keep-alives {keep_alives}")
+
+    async def _send(self, ws, outgoing: asyncio.Queue):
+        while True:
+            response = await outgoing.get()
+            try:
+                await ws.send(json.dumps(response))
+            except websockets.exceptions.ConnectionClosed:
+                pass
+            outgoing.task_done()
+
+
+async def serve(args):
+    server = StandinServer(load_transcript(args.transcript), args.bytes_per_word, args.latency_ms, args.error_rate, args.seed, args.drop_after)
+    async with websockets.serve(server.handle, args.host, args.port):
+        print(f"🎭 Deepgram stand-in on ws://{args.host}:{args.port}/listen")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcript", required=True, help="text file, one utterance per line")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    # ~0.4 s of speech per word: 1600 bytes of 32 kbps Opus, 12800 of 16 kHz linear16
+    parser.add_argument("--bytes-per-word", type=int, default=1600)
+    parser.add_argument("--latency-ms", type=int, default=0, help="delay before each result is sent")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of words misrecognized")
+    parser.add_argument("--drop-after", type=int, default=0, help="close each connection after this many audio frames")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
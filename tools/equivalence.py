@@ -0,0 +1,113 @@
+"""Checks that the indexed and streaming aligners agree with the original compare.
+
+    python -m tools.equivalence [--samples 2000] [--seed 0] [--script script.txt]
+
+Each sample is a random script excerpt and an ASR-like transcript of part
+of it: words dropped, misspelled, swapped for others or inserted, and
+punctuation and case lost. `compare_transcript`, `compare_indexed` with
+each scoring engine, and a greedy `StreamingAligner` (no skip limit or
+resync, fed the transcript as growing interims and then a final) must mark
+the same script words as matched. Without --script the excerpts come from
+a built-in passage. The check fails on any disagreement and prints the
+first few.
+"""
+from utils.aligner import StreamingAligner
+from utils.compare import compare_indexed, compare_transcript
+from utils.reference_index import ReferenceIndex
+from utils.scoring import ENGINES
+from typing import List
+import argparse
+import random
+import string
+import sys
+
+_PASSAGE = """To be, or not to be, that is the question: Whether 'tis nobler in the mind to suffer
+The slings and arrows of outrageous fortune, Or to take arms against a sea of troubles And by
+opposing end them. To die: to sleep; No more; and by a sleep to say we end The heart-ache and
+the thousand natural shocks That flesh is heir to, 'tis a consummation Devoutly to be wish'd."""
+
+
+def transcribe(script: List[str], vocab: List[str], rng: random.Random) -> List[str]:
+    # What an ASR result of a read-through looks like: unpunctuated, lowercase, imperfect
+    words = []
+    for word in script:
+        r = rng.random()
+        if r < 0.1:
+            continue
+        if r < 0.2:
+            word = rng.choice(vocab)
+        elif r < 0.3 and len(word) > 3:
+            k = rng.randrange(len(word))
+            word = word[:k] + word[k + 1:]
+        words.append(word.strip(string.punctuation).lower() if rng.random() < 0.7 else word)
+        if rng.random() < 0.1:
+            words.append(rng.choice(vocab))
+    return words
+
+
+def streamed(index: ReferenceIndex, words: List[str], start: int, engine: str) -> List[int]:
+    aligner = StreamingAligner(index, engine=engine, max_skip=None, mode="greedy", resync_after=0)
+    aligner.cursor = start
+    for k in range(1, len(words)):
+        aligner.update(words[:k])
+    return aligner.update(words, final=True).confirmed
+
+
+def check(script: List[str], words: List[str], start: int) -> List[str]:
+    """Names of the aligners that disagree with `compare_transcript` on one sample."""
+    index = ReferenceIndex(script)
+    # The original takes the script first, whatever its parameter names say
+    expected = compare_transcript(script[start:], words)
+    matched = [start + k for k, (_, ok) in enumerate(expected) if ok]
+    failed = []
+    for engine in ENGINES:
+        if compare_indexed(index, words, start, engine=engine) != expected:
+            failed.append(f"compare_indexed[{engine}]")
+        if streamed(index, words, start, engine) != matched:
+            failed.append(f"StreamingAligner[{engine}]")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--script", help="text file to draw script excerpts from")
+    parser.add_argument("--max-words", type=int, default=40, help="longest script excerpt")
+    args = parser.parse_args()
+
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = _PASSAGE
+    vocab = text.split()
+    rng = random.Random(args.seed)
+
+    failures = 0
+    for sample in range(args.samples):
+        if rng.random() < 0.5:
+            # a contiguous excerpt, as rehearsed
+            first = rng.randrange(len(vocab))
+            script = vocab[first:first + rng.randint(0, args.max_words)]
+        else:
+            # shuffled words, so the same word recurs near the window
+            script = [rng.choice(vocab) for _ in range(rng.randint(0, args.max_words))]
+        start = rng.randint(0, len(script))
+        words = transcribe(script[start:start + rng.randint(0, 12)], vocab, rng)
+        failed = check(script, words, start)
+        if failed:
+            failures += 1
+            if failures <= 5:
+                print(f"❌ Sample {sample}: {', '.join(failed)} disagree")
+                print(f"   script[{start}:]: {' '.join(script[start:])}")
+                print(f"   transcript: {' '.join(words)}")
+
+    if failures:
+        print(f"❌ {failures} of {args.samples} samples disagree (seed {args.seed})")
+        sys.exit(1)
+    print(f"✅ All aligners agree on {args.samples} samples (seed {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
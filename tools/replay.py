@@ -0,0 +1,139 @@
+"""Replays a session recording through the session, aligner and feedback pipeline.
+
+    python -m tools.replay recordings/20250101-120000-0123abcd4567.jsonl [--speed recorded|max] [--json]
+
+The recorded ASR results, control events and upstream reconnects are fed
+to a real `Session` in their original order (recorded speed keeps the original gaps, max speed
+drops them). No ASR or client is involved: results are injected as if the
+backend had delivered them, and feedback frames are captured in memory.
+The summary (final word states, frame counts, per-result processing time)
+is the baseline a later run of the same recording is compared against.
+"""
+from starlette.websockets import WebSocketState
+from websocket.recorder import script_path
+from websocket.session import Session
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import time
+
+
+class CaptureWebSocket:
+    """Stands in for the client socket; keeps every frame the session sends."""
+
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text: str):
+        self.frames.append(json.loads(text))
+
+    async def close(self):
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+class ReplayBackend:
+    """ASRBackend that sends nowhere; the replay delivers results through `on_result`."""
+
+    needs_script = False
+    done = False
+
+    def __init__(self, on_result):
+        self.on_result = on_result
+
+    async def open(self, audio_format=None, script=None):
+        pass
+
+    def send_audio(self, data: bytes):
+        pass
+
+    def keep_alive(self):
+        pass
+
+    def backlog(self) -> int:
+        return 0
+
+    async def finish(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+async def replay(path: str, speed: str = "max") -> dict:
+    with open(path, encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+
+    websocket = CaptureWebSocket()
+    # Never re-record a replay, even with RECALLR_RECORD_DIR set
+    session = Session(websocket, backend_factory=ReplayBackend, recorder_factory=lambda: None)
+    session.start()
+
+    timings = []
+    started = time.monotonic()
+    for event in events:
+        if speed == "recorded":
+            await asyncio.sleep(max(0.0, event["t"] - (time.monotonic() - started)))
+
+        if event["ev"] == "script":
+            with open(script_path(os.path.dirname(path), event["hash"]), encoding="utf-8") as f:
+                session.on_script({"type": "script", "payload": f.read()})
+            while session.aligner is None or session.aligner.index.script_hash != event["hash"]:
+                await asyncio.sleep(0)
+        elif event["ev"] == "control":
+            session.on_control(event["data"])
+        elif event["ev"] == "reconnect":
+            session.set_asr_clock(event["time_offset"], event["dedupe_until"])
+        elif event["ev"] == "asr":
+            tick = time.perf_counter()
+            session.on_transcript(event["r"])
+            timings.append(time.perf_counter() - tick)
+        await asyncio.sleep(0)  # let the writer run, as between socket events
+
+    await asyncio.sleep(0)
+    states = session.aligner.progress.encode() if session.aligner is not None else ""
+    stats = session.aligner.stats() if session.aligner is not None else {}
+    await session.close()
+
+    timings.sort()
+    return {
+        "events": len(events),
+        "results": len(timings),
+        "frames": len(websocket.frames),
+        "correct": states.count("2"),
+        "skipped": states.count("3"),
+        "words": len(states),
+        "states_sha256": hashlib.sha256(states.encode()).hexdigest(),
+        "alignment": stats,
+        "total_ms": round(1000 * sum(timings), 2),
+        "avg_ms": round(1000 * sum(timings) / len(timings), 3) if timings else 0,
+        "p95_ms": round(1000 * timings[int(0.95 * (len(timings) - 1))], 3) if timings else 0,
+        "max_ms": round(1000 * timings[-1], 3) if timings else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="a .jsonl file written with RECALLR_RECORD_DIR set")
+    parser.add_argument("--speed", choices=("recorded", "max"), default="max")
+    parser.add_argument("--json", action="store_true", help="print the summary as one JSON line")
+    parser.add_argument("--verbose", action="store_true", help="keep the session's own log output")
+    args = parser.parse_args()
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        summary = asyncio.run(replay(args.recording, args.speed))
+
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        for key, value in summary.items():
+            print(f"{key:>14}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+from typing import List, NamedTuple, Optional, Tuple
+from utils.banded_align import BandedAlignment, BandedDP
+from utils.compare import confidence_leeway, match_position
+from utils.phonetic_cache import phonetic_cache
+from utils.progress import CORRECT, PROVISIONAL, SKIPPED, UNSEEN, SessionProgress
+from utils.reference_index import ReferenceIndex
+from utils.scoring import make_scorer
+import os
+
+# "greedy" is the original 4-word window, "banded" the DP that recovers from skips and ad-libs
+ALIGN_MODE = os.getenv("RECALLR_ALIGN_MODE", "greedy")
+ALIGN_BAND = int(os.getenv("RECALLR_ALIGN_BAND", "16"))
+ALIGN_MODES = ("greedy", "banded")
+
+# Greedy window width used by match_position
+WINDOW = 4
+# Script words walked without a match before an event gives up
+DEFAULT_MAX_SKIP = 64
+# Unmatched transcript words in a row before jumping via the n-gram index (0 disables)
+RESYNC_AFTER = int(os.getenv("RECALLR_RESYNC_AFTER", "4"))
+
+
+class AlignmentUpdate(NamedTuple):
+    confirmed: List[int]             # committed by a final result
+    provisional_added: List[int]     # newly highlighted by an interim
+    provisional_removed: List[int]   # no longer matched by the latest hypothesis
+    skipped: List[int]               # committed as left out by the actor (banded mode)
+    inserted: List[int]              # transcript positions with no script word (banded mode)
+
+
+class StreamingAligner:
+    """Keeps alignment state for one session across Deepgram events.
+
+    Deepgram re-sends the whole utterance on every interim result, so each
+    `update` only re-scores the script positions whose 4-word window touched
+    transcript tokens that changed since the previous hypothesis. The greedy
+    walk is deterministic in (anchor, hypothesis), so resuming from a
+    checkpoint gives the same result as aligning the utterance from scratch.
+
+    In "banded" mode the utterance is aligned with `BandedDP` instead, whose
+    rows are likewise reused for the unchanged prefix. Script words it reports
+    as skipped are committed on the final result and the cursor moves past
+    them, so a skipped phrase never stalls progress.
+
+    When the last `resync_after` words of the utterance match nothing near
+    the anchor, the tail is looked up in the script's n-gram index and the
+    rest of the utterance is realigned from the best hit, so page jumps in
+    either direction are found without rescanning the script.
+    """
+
+    def __init__(self, index: ReferenceIndex, engine: str = None, max_skip: Optional[int] = DEFAULT_MAX_SKIP, mode: str = None, band: int = None, resync_after: int = None):
+        mode = mode or ALIGN_MODE
+        if mode not in ALIGN_MODES:
+            raise ValueError(f"Unknown alignment mode: {mode}")
+
+        self.index = index
+        self.engine = engine
+        self.max_skip = max_skip
+        self.mode = mode
+        self.band = band or ALIGN_BAND
+        self.resync_after = RESYNC_AFTER if resync_after is None else resync_after
+
+        self.cursor = 0          # first script position not yet confirmed
+        self.progress = SessionProgress(index)
+        self.provisional = set() # positions matched by the current interim hypothesis
+        self.resyncs = 0
+        self.finals = 0
+        self.heard = 0           # transcript words in final results
+        self.unmatched = 0       # of those, words that matched no script word
+
+        self._utterance_anchor = None  # cursor when the current utterance started
+        self._anchor = None      # script position the words from `_offset` are aligned from
+        self._offset = 0         # first transcript word of the current sub-alignment
+        self._carried = {}       # script position -> transcript position, for matches made before a resync
+        self._words: List[str] = []
+        self._leeway: List[int] = []    # per-word threshold leeway from ASR confidence
+        self._times: List[float] = []   # per-word ASR end times, when the backend gives them
+        self._clean: List[str] = []
+        self._meta: List[str] = []
+        # one (ref_index before, matched transcript position) per script position from the anchor,
+        # transcript positions relative to `_offset`
+        self._steps: List[Tuple[int, Optional[int]]] = []
+        self._ref_end = 0
+        self._dp: Optional[BandedDP] = None
+        self._scorer = None      # kept across updates so cached tiles of unchanged words are reused
+
+    def update(self, words: List[str], final: bool = False, confidences: Optional[List[float]] = None, times: Optional[List[float]] = None) -> Optional[AlignmentUpdate]:
+        """Align the latest hypothesis of the current utterance.
+
+        Interim results only move the provisional highlighting; a final result
+        commits the utterance's matches and closes it so the next one is
+        anchored at the cursor. Returns None for an interim identical to the
+        previous one. With per-word ASR `confidences` the match thresholds are
+        relaxed for doubtful words; with per-word end `times` each confirmed
+        script word is stamped with the time of the word it matched.
+        """
+        leeway = [confidence_leeway(c) for c in confidences] if confidences else [0] * len(words)
+        if not final and self._utterance_anchor is not None and words == self._words and leeway == self._leeway:
+            return None
+        if self._utterance_anchor is None:
+            self._utterance_anchor = self.cursor
+            self._restart(self.cursor, 0)
+
+        prefix = self._common_prefix(words, leeway)
+        self._encode(words, prefix)
+        self._leeway = leeway
+        self._times = list(times) if times else []
+
+        if prefix < self._offset:
+            # the words a resync was based on were rewritten
+            self._restart(self._utterance_anchor, 0)
+            self._carried = {}
+
+        alignment = self._align(prefix - self._offset)
+        local = self._local_matches(alignment)
+        tail = len(self._words) - self._offset - (local[-1][1] + 1 if local else 0)
+        if self.resync_after and tail >= self.resync_after:
+            target = self.index.ngrams.lookup(self._clean[self._offset:], self._meta[self._offset:], self._anchor)
+            if target is not None:
+                pos, start = target
+                # realign the whole unmatched tail, assuming it leads up to the n-gram hit
+                tail_start = len(self._words) - self._offset - tail
+                anchor = max(0, pos - (start - tail_start))
+                if (anchor, tail_start) != (self._anchor, 0):
+                    self._carried.update((p, self._offset + i) for p, i in local)
+                    self._restart(anchor, self._offset + tail_start)
+                    self.resyncs += 1
+                    alignment = self._align(0)
+            elif len(local) < len(alignment.matched):
+                # the walk lost the actor; whatever it found past the local run is chance
+                end = local[-1][0] if local else self._anchor - 1
+                kept = {i for _, i in local}
+                dropped = [i for _, i in alignment.matched if i not in kept]
+                alignment = BandedAlignment(local, [p for p in alignment.skipped if p < end], sorted(alignment.inserted + dropped))
+
+        landed = {pos for pos, _ in alignment.matched}
+        matches = set(self._carried) | landed
+        skipped = alignment.skipped
+        inserted = [self._offset + i for i in alignment.inserted]
+
+        states = self.progress.states
+        current = {pos for pos in matches if states[pos] != CORRECT}
+
+        if not final:
+            added = sorted(current - self.provisional)
+            removed = sorted(self.provisional - current)
+            self._set_provisional(added, removed)
+            self.provisional = current
+            return AlignmentUpdate([], added, removed, [], inserted)
+
+        confirmed = sorted(current)
+        removed = sorted(self.provisional - current)
+        self._set_provisional([], removed)
+        skipped = [pos for pos in skipped if states[pos] in (UNSEEN, PROVISIONAL)]
+        for pos in skipped:
+            self.progress.set_state(pos, SKIPPED)
+        for pos in confirmed:
+            self.progress.set_state(pos, CORRECT)
+        if self._times:
+            heard_at = {**self._carried, **{pos: self._offset + i for pos, i in alignment.matched}}
+            for pos in confirmed:
+                self.progress.stamp(pos, self._times[heard_at[pos]])
+        self.provisional = set()
+        self.finals += 1
+        self.heard += len(self._words)
+        self.unmatched += max(0, len(self._words) - len(matches))
+
+        if self._anchor != self._utterance_anchor and landed:
+            # the actor jumped; carry on from where they are now
+            self.cursor = max(landed) + 1
+        while self.cursor < len(self.index) and self.progress.is_done(self.cursor):
+            self.cursor += 1
+
+        self._end_utterance()
+        return AlignmentUpdate(confirmed, [], removed, skipped, inserted)
+
+    def stats(self) -> dict:
+        return {
+            "finals": self.finals,
+            "heard": self.heard,
+            "unmatched": self.unmatched,
+            "resyncs": self.resyncs,
+            "pace_wpm": round(self.progress.pace_wpm() or 0),
+        }
+
+    def pending_words(self) -> int:
+        """Transcript words of the utterance still open (0 right after a final)."""
+        return len(self._words)
+
+    def _set_provisional(self, added: List[int], removed: List[int]):
+        # skipped words keep showing as skipped until a final commits them
+        progress = self.progress
+        for pos in added:
+            if progress.state(pos) == UNSEEN:
+                progress.set_state(pos, PROVISIONAL)
+        for pos in removed:
+            if progress.state(pos) == PROVISIONAL:
+                progress.set_state(pos, UNSEEN)
+
+    def _end_utterance(self):
+        self._utterance_anchor = None
+        self._carried = {}
+        self._words, self._clean, self._meta = [], [], []
+        self._leeway, self._times = [], []
+        self._restart(None, 0)
+
+    def _restart(self, anchor: Optional[int], offset: int):
+        self._anchor = anchor
+        self._offset = offset
+        self._steps = []
+        self._ref_end = 0
+        self._dp = None
+        self._scorer = None
+
+    def _align(self, prefix: int) -> BandedAlignment:
+        if self.mode == "banded":
+            return self._realign_banded(prefix)
+        self._realign(prefix)
+        matched = [(self._anchor + k, match) for k, (_, match) in enumerate(self._steps) if match is not None]
+        return BandedAlignment(matched, [], [])
+
+    def _local_matches(self, alignment: BandedAlignment) -> List[Tuple[int, int]]:
+        # The run of matches that stays near the anchor: each within the window (the band, in
+        # banded mode) of the one before. A greedy walk that lost the actor still lands on
+        # common words further on; those are not evidence of where the actor is.
+        slack = self.band if self.mode == "banded" else WINDOW
+        local, last = [], self._anchor - 1
+        for pos, i in alignment.matched:
+            if pos - last > slack:
+                break
+            local.append((pos, i))
+            last = pos
+        return local
+
+    def _common_prefix(self, words: List[str], leeway: List[int]) -> int:
+        # a word whose confidence moved it to another leeway is rescored like a changed word
+        prefix = 0
+        for old, new in zip(zip(self._words, self._leeway), zip(words, leeway)):
+            if old != new:
+                break
+            prefix += 1
+        return prefix
+
+    def _encode(self, words: List[str], prefix: int):
+        encoded = [phonetic_cache.encode(w) for w in words[prefix:]]
+        self._clean = self._clean[:prefix] + [clean for clean, _ in encoded]
+        self._meta = self._meta[:prefix] + [meta for _, meta in encoded]
+        self._words = list(words)
+
+    def _scorer_for(self, prefix: int):
+        clean, meta = self._clean[self._offset:], self._meta[self._offset:]
+        if self._scorer is None:
+            self._scorer = make_scorer(self.index, clean, meta, self.engine)
+        else:
+            self._scorer.update_words(clean, meta, prefix)
+        return self._scorer
+
+    def _realign(self, prefix: int):
+        # Steps whose window only saw the unchanged prefix still hold; replay the rest
+        keep = len(self._steps)
+        while keep and self._steps[keep - 1][0] + WINDOW > prefix:
+            keep -= 1
+
+        if keep < len(self._steps):
+            ref_index = self._steps[keep][0]
+            del self._steps[keep:]
+        else:
+            ref_index = self._ref_end
+
+        misses = 0
+        while misses < keep and self._steps[keep - 1 - misses][1] is None:
+            misses += 1
+
+        words = self._words[self._offset:]
+        leeway = self._leeway[self._offset:]
+        scorer = self._scorer_for(prefix)
+        pos = self._anchor + len(self._steps)
+
+        while pos < len(self.index) and ref_index < len(words):
+            if self.max_skip is not None and misses >= self.max_skip:
+                break
+            match = match_position(self.index, scorer, pos, ref_index, words, leeway=leeway)
+            self._steps.append((ref_index, match))
+            if match is not None:
+                ref_index = match + 1
+                misses = 0
+            else:
+                misses += 1
+            pos += 1
+
+        self._ref_end = ref_index
+
+    def _realign_banded(self, prefix: int):
+        if self._dp is None:
+            self._dp = BandedDP(self.index, self._anchor, self.band)
+        scorer = self._scorer_for(prefix)
+        self._dp.extend(scorer, len(self._words) - self._offset, prefix, self._leeway[self._offset:])
+        return self._dp.result()
@@ -0,0 +1,113 @@
+from typing import List, NamedTuple, Optional, Tuple
+from utils.compare import cell_score
+from utils.reference_index import ReferenceIndex
+
+NEG_INF = float("-inf")
+
+# traceback moves
+MATCH, SKIP, INSERT = 0, 1, 2
+
+
+class BandedAlignment(NamedTuple):
+    matched: List[Tuple[int, int]]   # (script position, transcript position)
+    skipped: List[int]               # script positions the actor left out
+    inserted: List[int]              # transcript positions with no script word
+
+
+class BandedDP:
+    """Banded global alignment of one utterance against the script from `anchor`.
+
+    Row j holds the best scores after consuming j transcript words, for script
+    offsets within `band` of j, so time and memory are O(transcript x band).
+    Matches are only allowed where `cell_score` passes the greedy thresholds
+    and earn the combined score / 100; skipped script words and inserted
+    transcript words cost a flat penalty. The script end is free, so unread
+    script after the last match is not reported as skipped. Rows only depend on
+    earlier transcript words, so `extend` can resume after an unchanged prefix.
+    """
+
+    def __init__(self, index: ReferenceIndex, anchor: int, band: int, skip_penalty: float = 0.3, insert_penalty: float = 0.5):
+        self.index = index
+        self.anchor = anchor
+        self.band = band
+        self.skip_penalty = skip_penalty
+        self.insert_penalty = insert_penalty
+        self.max_offset = len(index) - anchor
+
+        width = 2 * band + 1
+        first = [NEG_INF] * width
+        moves = [SKIP] * width
+        for k in range(band, min(width, band + self.max_offset + 1)):
+            first[k] = -skip_penalty * (k - band)
+        self.rows: List[List[float]] = [first]
+        self.moves: List[List[int]] = [moves]
+
+    def extend(self, scorer, window_len: int, valid_rows: int, leeway: Optional[List[int]] = None):
+        """Recompute rows after the first `valid_rows` transcript words.
+
+        `leeway` lowers the match thresholds per transcript word, as in `cell_score`.
+        """
+        del self.rows[valid_rows + 1:]
+        del self.moves[valid_rows + 1:]
+
+        band = self.band
+        width = 2 * band + 1
+        for j in range(len(self.rows) - 1, window_len):
+            prev = self.rows[j]
+            row = [NEG_INF] * width
+            moves = [INSERT] * width
+            for k in range(width):
+                offset = j + 1 + k - band
+                if offset < 0 or offset > self.max_offset:
+                    continue
+
+                best = NEG_INF
+                move = INSERT
+                if k + 1 < width and prev[k + 1] != NEG_INF:
+                    best = prev[k + 1] - self.insert_penalty
+                if offset > 0 and prev[k] != NEG_INF:
+                    reward = cell_score(self.index, scorer, self.anchor + offset - 1, j, leeway[j] if leeway else 0)
+                    if reward and prev[k] + reward / 100 > best:
+                        best = prev[k] + reward / 100
+                        move = MATCH
+                if k > 0 and row[k - 1] - self.skip_penalty > best:
+                    best = row[k - 1] - self.skip_penalty
+                    move = SKIP
+
+                row[k] = best
+                moves[k] = move
+            self.rows.append(row)
+            self.moves.append(moves)
+
+    def result(self) -> BandedAlignment:
+        # A long ad-lib drifts the transcript out of the band and every later cell is -inf, so
+        # the end may be any row: each row's best cell is scored as if the transcript words
+        # after it were inserted, which the last row's cells already include while in band
+        end = len(self.rows) - 1
+        best, j, k = NEG_INF, end, self.band
+        for row_index in range(end, -1, -1):
+            row = self.rows[row_index]
+            col = max(range(len(row)), key=lambda c: row[c])
+            score = row[col] - self.insert_penalty * (end - row_index)
+            if score > best + 1e-9:
+                best, j, k = score, row_index, col
+        offset = j + k - self.band
+
+        matched, skipped, inserted = [], [], list(range(end - 1, j - 1, -1))
+        while j > 0 or offset > 0:
+            move = self.moves[j][offset - j + self.band]
+            if move == MATCH:
+                matched.append((self.anchor + offset - 1, j - 1))
+                j -= 1
+                offset -= 1
+            elif move == SKIP:
+                skipped.append(self.anchor + offset - 1)
+                offset -= 1
+            else:
+                inserted.append(j - 1)
+                j -= 1
+
+        matched.reverse()
+        skipped.reverse()
+        inserted.reverse()
+        return BandedAlignment(matched, skipped, inserted)
@@ -1,9 +1,28 @@
 from metaphone import doublemetaphone
 from fuzzywuzzy import fuzz
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from utils.phonetic_cache import phonetic_cache
+from utils.reference_index import ReferenceIndex
+from utils.scoring import make_scorer
+import os
 import string
 import re
 
+# Decision thresholds shared by every alignment path
+COMBINED_THRESHOLD = 85
+PHONETIC_THRESHOLD = 80
+SHORT_WORD_THRESHOLD = 95
+# Threshold points given up per unit of ASR doubt (1 - confidence), capped; 0 ignores confidence.
+# A word the ASR itself was unsure of is more likely misheard than misspoken.
+CONFIDENCE_WEIGHT = float(os.getenv("RECALLR_CONFIDENCE_WEIGHT", "20"))
+MAX_LEEWAY = 10
+
+def confidence_leeway(confidence: Optional[float]) -> int:
+    """Whole points to lower the combined/phonetic thresholds by for one transcript word."""
+    if confidence is None:
+        return 0
+    return int(min(MAX_LEEWAY, max(0.0, CONFIDENCE_WEIGHT * (1 - confidence))))
+
 def clean_word(word: str) -> str:
     return re.sub(r"[^\w\s]", "", word).lower()
 
@@ -51,7 +70,7 @@ def compare_transcript(transcript_words: List[str], reference_words: List[str],
         # Handle short word fallback first
         if len(t_clean) <= 2 and ref_index < len(reference_words):
             ref_word_clean = reference_words[ref_index].strip(string.punctuation).lower()
-            if fuzz.partial_ratio(t_clean, ref_word_clean) >= 95:
+            if fuzz.partial_ratio(t_clean, ref_word_clean) >= SHORT_WORD_THRESHOLD:
                 matched_indices.add(ref_index)
                 result.append((t_word, True))
                 if verbose:
@@ -63,10 +82,10 @@ def compare_transcript(transcript_words: List[str], reference_words: List[str],
         is_correct = False
         match_idx = None
 
-        if best_score >= 85 and best_match_index is not None:
+        if best_score >= COMBINED_THRESHOLD and best_match_index is not None:
             match_idx = best_match_index
             is_correct = True
-        elif best_phonetic_score >= 80 and best_phonetic_index is not None and len(t_clean) > 5:
+        elif best_phonetic_score >= PHONETIC_THRESHOLD and best_phonetic_index is not None and len(t_clean) > 5:
             match_idx = best_phonetic_index
             is_correct = True
 
@@ -82,4 +101,106 @@ def compare_transcript(transcript_words: List[str], reference_words: List[str],
 
         result.append((t_word, is_correct))
 
-    return result
\ No newline at end of file
+    return result
+
+def match_position(index: ReferenceIndex, scorer, pos: int, ref_index: int, transcript_words: List[str], verbose: bool = False, leeway: Optional[List[int]] = None) -> Optional[int]:
+    """Greedy decision for script word `pos` against the 4-word window at `ref_index`.
+
+    Returns the matched transcript position, or None if nothing in the window
+    passes the thresholds. `leeway` optionally lowers the combined and
+    phonetic thresholds per transcript word (see `confidence_leeway`); the
+    short-word rule stays exact. Shared by `compare_indexed` and the
+    streaming aligner.
+    """
+    window_len = len(transcript_words)
+    s_word = index.words[pos]
+    best_score = 0
+    best_match_index = None
+    best_phonetic_score = 0
+    best_phonetic_index = None
+
+    for i in range(ref_index, min(window_len, ref_index + 4)):
+        fuzzy_score = scorer.lexical(pos, i)
+        phonetic_score = scorer.phonetic(pos, i)
+
+        if verbose:
+            print(f"🔎 '{s_word}' vs ref[{i}] = '{transcript_words[i]}' | 🧠 Metaphone: {index.meta[pos]} vs {scorer.words_meta[i]} | 🎯 Fuzzy: {fuzzy_score}, Phonetic: {phonetic_score}")
+
+        combined_score = (fuzzy_score + phonetic_score) / 2
+
+        # window slots behind ref_index are never revisited, so every slot here is unmatched
+        if combined_score > best_score:
+            best_score = combined_score
+            best_match_index = i
+
+        if phonetic_score > best_phonetic_score:
+            best_phonetic_score = phonetic_score
+            best_phonetic_index = i
+
+    if index.lengths[pos] <= 2:
+        if scorer.lexical(pos, ref_index) >= SHORT_WORD_THRESHOLD:
+            if verbose:
+                print(f"🎯 Word: '{s_word}' (short) → ✅ Fallback match to '{transcript_words[ref_index]}' [ref {ref_index}] → ref_index = {ref_index + 1}")
+            return ref_index
+
+    match_idx = None
+    if best_match_index is not None and best_score >= COMBINED_THRESHOLD - (leeway[best_match_index] if leeway else 0):
+        match_idx = best_match_index
+    elif best_phonetic_index is not None and index.lengths[pos] > 5 and best_phonetic_score >= PHONETIC_THRESHOLD - (leeway[best_phonetic_index] if leeway else 0):
+        match_idx = best_phonetic_index
+
+    if verbose:
+        if match_idx is not None:
+            print(f"🎯 Word: '{s_word}' → ✅ Matched to '{transcript_words[match_idx]}' [ref {match_idx}] → ref_index = {match_idx + 1}")
+        else:
+            print(f"🎯 Word: '{s_word}' → ❌ No match [ref_index = {ref_index}]")
+
+    return match_idx
+
+def cell_score(index: ReferenceIndex, scorer, pos: int, i: int, leeway: int = 0) -> float:
+    """Combined score of script word `pos` vs transcript word `i`, or 0 if the pair
+    would not pass any of the greedy match rules (thresholds lowered by `leeway`)."""
+    fuzzy_score = scorer.lexical(pos, i)
+    phonetic_score = scorer.phonetic(pos, i)
+    combined_score = (fuzzy_score + phonetic_score) / 2
+    length = index.lengths[pos]
+
+    if (
+        combined_score >= COMBINED_THRESHOLD - leeway
+        or (phonetic_score >= PHONETIC_THRESHOLD - leeway and length > 5)
+        or (length <= 2 and fuzzy_score >= SHORT_WORD_THRESHOLD)
+    ):
+        return combined_score
+    return 0
+
+def compare_indexed(index: ReferenceIndex, transcript_words: List[str], start: int = 0, verbose: bool = False, engine: str = None) -> List[Tuple[str, bool]]:
+    """Same result as `compare_transcript(index.words[start:], transcript_words)`.
+
+    Script-side cleaning and metaphone codes come from the prebuilt index and
+    the transcript words are encoded once per call, through the shared
+    phonetic cache, instead of once per window slot. `engine` picks the scorer
+    (see utils.scoring); the greedy decision rules in `match_position` are the
+    same for every engine.
+    """
+    encoded = [phonetic_cache.encode(w) for w in transcript_words]
+    words_clean = [clean for clean, _ in encoded]
+    words_meta = [meta for _, meta in encoded]
+    window_len = len(transcript_words)
+    scorer = make_scorer(index, words_clean, words_meta, engine)
+
+    ref_index = 0
+    result = []
+
+    for pos in range(start, len(index)):
+        if ref_index >= window_len:
+            if verbose:
+                print(f"⚠️ Ref index {ref_index} out of bounds for reference length {window_len}")
+            break
+
+        match_idx = match_position(index, scorer, pos, ref_index, transcript_words, verbose)
+        if match_idx is not None:
+            ref_index = match_idx + 1
+
+        result.append((index.words[pos], match_idx is not None))
+
+    return result
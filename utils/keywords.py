@@ -0,0 +1,97 @@
+from collections import Counter
+from typing import List
+from utils.reference_index import ReferenceIndex
+import os
+import string
+
+# Script words sent to Deepgram as keywords (0 disables boosting)
+KEYWORD_LIMIT = int(os.getenv("DEEPGRAM_KEYWORD_LIMIT", "0"))
+# Deepgram intensifiers: names are what ASR gets wrong most, so they get the strongest boost
+PROPER_NOUN_BOOST = 2
+RARE_WORD_BOOST = 1
+# Long words are the likeliest to be missing from the ASR vocabulary
+MIN_RARE_LENGTH = 8
+
+# Stage English that general-purpose ASR hears as modern words ("thou" -> "now")
+_ARCHAIC = frozenset("""
+    thou thee thy thine ye hath doth dost wast wert shalt wilt canst couldst wouldst
+    hither thither whither hence thence whence wherefore ere nay aye anon prithee forsooth
+    methinks mayhap perchance alack alas oft tis twas
+""".split())
+
+# Everyday long words general-purpose ASR already knows; length alone makes them look rare
+_COMMON = frozenset("""
+    absolutely according actually afternoon although american anything anywhere apparently
+    attention available beautiful becoming beginning behaviour believed birthday brothers
+    building business certainly children christmas committee community complete completely
+    consider continue conversation daughter daughters delighted different difficult directly
+    discover distance document education elsewhere especially evenings everybody everyone
+    everything everywhere evidence excellent expected experience families favourite finished
+    following forgotten friendly frightened gentleman gentlemen government happened
+    happiness hospital important impossible including increase information innocent instance
+    interest interested interesting language listening material mattered meantime military
+    minister mistress national necessary neighbour neighbours nevertheless obviously
+    officers ourselves particular patience perfectly personal pleasant pleasure political
+    position possible practice presence president pressure probably property question
+    questions reaching reasonable remember remembered research response returned security
+    sentence seriously shoulder shoulders situation somebody something sometimes somewhere
+    standard straight stranger strangers strength students suddenly supposed surprise
+    surprised sweetheart teaching telephone terrible thankful themselves therefore thinking
+    thoughts thousand together tomorrow training troubles understand understood universe
+    whatever whenever wherever wonderful yesterday yourself yourselves
+""".split())
+
+_SENTENCE_END = (".", "!", "?", ":", ";")
+
+
+def script_keywords(index: ReferenceIndex, limit: int = KEYWORD_LIMIT) -> List[str]:
+    """Deepgram `keywords` values ("word:boost") for the words of `index` ASR is likeliest to miss.
+
+    Proper nouns (capitalized mid-sentence and never written in lowercase)
+    come first, most frequent first and spelled as in the script ("McDuff");
+    then archaic words, then long words that occur at most twice and are
+    not everyday English. Speaker cues ("HAMLET:") are not spoken and are
+    not counted.
+    """
+    if limit <= 0:
+        return []
+
+    counts = Counter()
+    lowercase = set()
+    capitalized = Counter()
+    spellings = {}  # clean -> Counter of the capitalized forms it appears in
+    for i, (word, clean) in enumerate(zip(index.words, index.clean)):
+        if not clean.isalpha() or word.endswith(":"):
+            continue
+        counts[clean] += 1
+        surface = word.strip(string.punctuation)
+        if surface[:1].islower():
+            lowercase.add(clean)
+        elif i > 0 and not index.words[i - 1].endswith(_SENTENCE_END):
+            capitalized[clean] += 1
+            spellings.setdefault(clean, Counter())[surface] += 1
+
+    proper = [clean for clean, _ in capitalized.most_common() if clean not in lowercase and len(clean) > 1]
+    archaic = sorted(c for c in counts if c in _ARCHAIC)
+    rare = sorted(
+        (c for c, n in counts.items() if n <= 2 and len(c) >= MIN_RARE_LENGTH and not _is_common(c)),
+        key=lambda c: (-len(c), c),
+    )
+
+    keywords, seen = [], set()
+    for words, boost in ((proper, PROPER_NOUN_BOOST), (archaic, RARE_WORD_BOOST), (rare, RARE_WORD_BOOST)):
+        for clean in words:
+            if clean not in seen and len(keywords) < limit:
+                seen.add(clean)
+                form = spellings[clean].most_common(1)[0][0] if boost == PROPER_NOUN_BOOST else clean
+                keywords.append(f"{form}:{boost}")
+    return keywords
+
+
+def _is_common(word: str) -> bool:
+    # Inflected forms of a listed word are as common as the word ("questioned", "gentlemanly")
+    stems = [word]
+    for suffix in ("s", "es", "ed", "d", "ing", "ly"):
+        if word.endswith(suffix):
+            stems.append(word[:-len(suffix)])
+    return any(stem in _COMMON for stem in stems)
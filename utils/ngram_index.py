@@ -0,0 +1,52 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class NgramIndex:
+    """Inverted index of script bigrams/trigrams, over cleaned words and metaphone codes.
+
+    Built once per script so the aligner can find where the actor is after a
+    jump with a dict lookup instead of rescanning the script. Punctuation-only
+    tokens are left out, so n-grams span them.
+    """
+
+    def __init__(self, clean: Sequence[str], meta: Sequence[str], sizes: Tuple[int, ...] = (3, 2)):
+        self.sizes = sizes
+        positions = [i for i, c in enumerate(clean) if c]
+
+        # (kind, token, ...) -> ascending script positions of the n-gram's first word
+        self._table: Dict[tuple, List[int]] = {}
+        for n in sizes:
+            for k in range(len(positions) - n + 1):
+                span = positions[k:k + n]
+                self._table.setdefault(("c",) + tuple(clean[p] for p in span), []).append(span[0])
+                self._table.setdefault(("m",) + tuple(meta[p] for p in span), []).append(span[0])
+
+    def lookup(self, clean: Sequence[str], meta: Sequence[str], near: int, max_hits: int = 4) -> Optional[Tuple[int, int]]:
+        """Find the end of a transcript in the script.
+
+        Tries the longest n-gram first, exact words before metaphone codes, and
+        breaks ties by distance to `near`. N-grams occurring more than
+        `max_hits` times ("of the") are too ambiguous to jump on. Returns
+        (script position, transcript position) of the n-gram's first word, or None.
+        """
+        tokens = [i for i, c in enumerate(clean) if c]
+        for n in self.sizes:
+            if len(tokens) < n:
+                continue
+            tail = tokens[-n:]
+            for key in (("c",) + tuple(clean[i] for i in tail), ("m",) + tuple(meta[i] for i in tail)):
+                hits = self._table.get(key)
+                if hits and len(hits) <= max_hits:
+                    return _nearest(hits, near), tail[0]
+        return None
+
+
+def _nearest(hits: List[int], near: int) -> int:
+    k = bisect_left(hits, near)
+    if k == 0:
+        return hits[0]
+    if k == len(hits):
+        return hits[-1]
+    before, after = hits[k - 1], hits[k]
+    return after if after - near <= near - before else before
@@ -0,0 +1,58 @@
+import numpy as np
+import os
+
+# What PCMConverter produces: the cheapest format Deepgram transcribes at full accuracy
+TARGET_SAMPLE_RATE = 16000
+# Convert declared multichannel / high-rate PCM to 16 kHz mono before sending it upstream
+PCM_DOWNMIX = os.getenv("RECALLR_PCM_DOWNMIX", "1") == "1"
+
+
+class PCMConverter:
+    """Downmixes interleaved 16-bit PCM to mono and resamples it to 16 kHz.
+
+    Chunks may split samples or frames anywhere; the partial frame and the
+    few samples the filter needs are carried into the next call, so the
+    output doesn't depend (beyond rounding) on how the input was chunked.
+    Resampling is a moving-average low-pass (width = the decimation ratio)
+    followed by linear interpolation, both vectorized over the chunk. That
+    is enough for speech recognition, not for listening.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, target_rate: int = TARGET_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.target_rate = target_rate
+        self.step = sample_rate / target_rate
+        self.width = max(1, int(round(self.step)))
+
+        self._frame_bytes = 2 * channels
+        self._remainder = b""
+        self._history = np.zeros(self.width, dtype=np.float32)
+        self._pos = float(self.width)  # first output, in filtered-sample coordinates
+
+    def process(self, data: bytes) -> bytes:
+        data = self._remainder + data
+        usable = len(data) - len(data) % self._frame_bytes
+        self._remainder = data[usable:]
+        mono = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+        mono = mono.reshape(-1, self.channels).mean(axis=1)
+        if self.step == 1:
+            return _to_pcm(mono)
+
+        x = np.concatenate([self._history, mono])
+        sums = np.cumsum(np.concatenate([[0.0], x]))
+        smooth = (sums[self.width:] - sums[:-self.width]) / self.width
+        last = len(smooth) - 1
+
+        count = int(np.floor((last - self._pos) / self.step)) + 1 if last >= self._pos else 0
+        positions = self._pos + self.step * np.arange(count)
+        out = np.interp(positions, np.arange(len(smooth)), smooth)
+
+        # the next call's smooth[0] is this call's smooth[last]
+        self._pos = self._pos + self.step * count - last
+        self._history = x[-self.width:]
+        return _to_pcm(out)
+
+
+def _to_pcm(samples: np.ndarray) -> bytes:
+    return np.clip(np.rint(samples), -32768, 32767).astype("<i2").tobytes()
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from metaphone import doublemetaphone
+from typing import Dict, Tuple
+import os
+import string
+import sys
+
+PHONETIC_CACHE_MAX_BYTES = int(os.getenv("RECALLR_PHONETIC_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# rough per-entry overhead of the OrderedDict node and the value tuple
+_ENTRY_OVERHEAD = 160
+
+
+class PhoneticCache:
+    """Process-wide LRU of transcript token -> (cleaned form, primary metaphone code).
+
+    Everyday words recur across every session on a worker, so the cache is
+    shared rather than per session. Its size is bounded by an estimate of the
+    bytes held, and the least recently used tokens are evicted first. Only
+    touched from the event loop thread, so it needs no locking.
+    """
+
+    def __init__(self, max_bytes: int = PHONETIC_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+
+    def encode(self, token: str) -> Tuple[str, str]:
+        entry = self._entries.get(token)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(token)
+            return entry
+
+        self.misses += 1
+        clean = token.strip(string.punctuation).lower()
+        entry = (clean, doublemetaphone(clean)[0])
+        self._entries[token] = entry
+        self.size_bytes += _entry_size(token, entry)
+
+        while self.size_bytes > self.max_bytes and self._entries:
+            old_token, old_entry = self._entries.popitem(last=False)
+            self.size_bytes -= _entry_size(old_token, old_entry)
+            self.evictions += 1
+
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _entry_size(token: str, entry: Tuple[str, str]) -> int:
+    return sys.getsizeof(token) + sys.getsizeof(entry[0]) + sys.getsizeof(entry[1]) + _ENTRY_OVERHEAD
+
+
+phonetic_cache = PhoneticCache()
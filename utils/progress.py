@@ -0,0 +1,61 @@
+from array import array
+from typing import List, Optional, Set
+from utils.reference_index import ReferenceIndex
+
+# per-word states, one byte each
+UNSEEN = 0
+PROVISIONAL = 1
+CORRECT = 2
+SKIPPED = 3
+
+_DIGITS = bytes.maketrans(b"\x00\x01\x02\x03", b"0123")
+
+
+class SessionProgress:
+    """Per-session word states over a shared, immutable ReferenceIndex.
+
+    Replaces the old list of {"word", "correct"} dicts: the words live once in
+    the index and a session only owns one byte per script word. Positions
+    whose state changed are collected until the feedback encoder takes them.
+    Confirmed words also get the ASR end time of the word they matched
+    (seconds of audio, 4 bytes per script word; negative until confirmed).
+    """
+
+    def __init__(self, index: ReferenceIndex):
+        self.index = index
+        self.states = bytearray(len(index))
+        self.changed: Set[int] = set()
+        self.times = array("f", [-1.0]) * len(index)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def state(self, i: int) -> int:
+        return self.states[i]
+
+    def set_state(self, i: int, state: int):
+        if self.states[i] != state:
+            self.states[i] = state
+            self.changed.add(i)
+
+    def take_changes(self) -> List[int]:
+        changed = sorted(self.changed)
+        self.changed.clear()
+        return changed
+
+    def encode(self, start: int = 0, end: int = None) -> str:
+        """States of [start, end) as a digit string, e.g. "2221003"."""
+        return self.states[start:end].translate(_DIGITS).decode("ascii")
+
+    def stamp(self, i: int, end: float):
+        self.times[i] = end
+
+    def pace_wpm(self) -> Optional[float]:
+        """Confirmed words per minute of speech, from the first to the last stamped word."""
+        stamped = [t for t in self.times if t >= 0]
+        if len(stamped) < 2 or max(stamped) <= min(stamped):
+            return None
+        return 60 * (len(stamped) - 1) / (max(stamped) - min(stamped))
+
+    def is_done(self, i: int) -> bool:
+        return self.states[i] in (CORRECT, SKIPPED)
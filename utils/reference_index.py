@@ -0,0 +1,44 @@
+from metaphone import doublemetaphone
+from typing import List
+from utils.ngram_index import NgramIndex
+import hashlib
+import string
+import weakref
+
+
+class ReferenceIndex:
+    """Per-script token table, built once when the script arrives.
+
+    Holds everything `compare_indexed` needs about the reference words so the
+    per-event path never re-cleans or re-encodes them. Treated as immutable:
+    sessions rehearsing the same script share one instance via `for_script`.
+    """
+
+    _shared: "weakref.WeakValueDictionary[str, ReferenceIndex]" = weakref.WeakValueDictionary()
+
+    def __init__(self, words: List[str], script_hash: str = None):
+        self.words: List[str] = list(words)
+        self.script_hash = script_hash or _hash_words(self.words)
+        self.clean: List[str] = [w.strip(string.punctuation).lower() for w in self.words]
+        self.lengths: List[int] = [len(c) for c in self.clean]
+
+        self.meta: List[str] = [doublemetaphone(c)[0] for c in self.clean]
+        self.ngrams = NgramIndex(self.clean, self.meta)
+
+    @classmethod
+    def for_script(cls, text: str) -> "ReferenceIndex":
+        """Index for `text`, shared with any live session on the same script."""
+        words = text.split()
+        script_hash = _hash_words(words)
+        index = cls._shared.get(script_hash)
+        if index is None:
+            index = cls(words, script_hash)
+            cls._shared[script_hash] = index
+        return index
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+
+def _hash_words(words: List[str]) -> str:
+    return hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
@@ -0,0 +1,150 @@
+from fuzzywuzzy import fuzz
+from rapidfuzz import fuzz as rf_fuzz, process
+from rapidfuzz.distance import Indel
+from typing import List, Tuple
+from utils.reference_index import ReferenceIndex
+import numpy as np
+import os
+
+# "pairwise" keeps the original fuzzywuzzy calls, "cdist" batches through rapidfuzz. A tile only
+# pays for its setup when most of its cells are read: cdist is faster in banded mode, which
+# scores whole bands, and slower for the greedy walk, which reads a few cells per script word
+SCORING_ENGINE = os.getenv("RECALLR_SCORING_ENGINE", "pairwise")
+
+
+class PairwiseScorer:
+    """Scores one (script position, transcript word) cell at a time with fuzzywuzzy."""
+
+    def __init__(self, index: ReferenceIndex, words_clean: List[str], words_meta: List[str]):
+        self.index = index
+        self.words_clean = words_clean
+        self.words_meta = words_meta
+
+    def update_words(self, words_clean: List[str], words_meta: List[str], prefix: int):
+        """Switch to a revised transcript whose first `prefix` words are unchanged."""
+        self.words_clean = words_clean
+        self.words_meta = words_meta
+
+    def lexical(self, pos: int, i: int) -> int:
+        # fuzzywuzzy short-circuits equal strings to 100; skip the call entirely
+        if self.index.clean[pos] == self.words_clean[i]:
+            return 100
+        return fuzz.partial_ratio(self.index.clean[pos], self.words_clean[i])
+
+    def phonetic(self, pos: int, i: int) -> int:
+        if self.index.meta[pos] == self.words_meta[i]:
+            return 100
+        return fuzz.ratio(self.index.meta[pos], self.words_meta[i])
+
+
+class CdistScorer:
+    """Scores tiles of script rows by transcript words in one cdist call per matrix.
+
+    Tiles of `block_rows` script positions by `block_cols` transcript words
+    are scored lazily the first time a cell inside them is asked for, so
+    a compare only pays for the cells near the path it takes. Scores are
+    rounded to ints and match fuzzywuzzy's exactly, including its
+    conventions for equal strings (100) and empty strings (0). The
+    phonetic matrix is fuzzywuzzy's `ratio` as computed. The lexical matrix
+    is first scored with rapidfuzz's optimal `partial_ratio`, which is
+    never below fuzzywuzzy's block heuristic. Cells where the exact score
+    could change a match decision are re-scored with fuzzywuzzy when they
+    are first read.
+    """
+
+    def __init__(self, index: ReferenceIndex, words_clean: List[str], words_meta: List[str], block_rows: int = 32, block_cols: int = 32):
+        self.index = index
+        self.words_clean = words_clean
+        self.words_meta = words_meta
+        self.block_rows = block_rows
+        self.block_cols = block_cols
+        self._tiles = {}
+
+    def _tile(self, pos: int, i: int):
+        r, row = divmod(pos, self.block_rows)
+        c, col = divmod(i, self.block_cols)
+        tile = self._tiles.get((r, c))
+        if tile is None:
+            rows = slice(r * self.block_rows, min(len(self.index), (r + 1) * self.block_rows))
+            cols = slice(c * self.block_cols, min(len(self.words_clean), (c + 1) * self.block_cols))
+            phonetic = _ratio_matrix(self.index.meta[rows], self.words_meta[cols])
+            lexical, inexact = _partial_ratio_bounds(self.index.clean[rows], self.words_clean[cols], phonetic)
+            # Nested lists: cells are read one at a time, and list indexing is much cheaper than NumPy's
+            tile = self._tiles[(r, c)] = (lexical.tolist(), phonetic.tolist(), inexact.tolist())
+        return tile, row, col
+
+    def update_words(self, words_clean: List[str], words_meta: List[str], prefix: int):
+        """Switch to a revised transcript whose first `prefix` words are unchanged.
+
+        Tiles of unchanged columns are kept; the rest, including a last tile
+        that was cut short by the old transcript's end, are rescored when read.
+        """
+        self.words_clean = words_clean
+        self.words_meta = words_meta
+        first = prefix // self.block_cols
+        for key in [key for key in self._tiles if key[1] >= first]:
+            del self._tiles[key]
+
+    def lexical(self, pos: int, i: int) -> int:
+        (lex, _, inexact), row, col = self._tile(pos, i)
+        if inexact[row][col]:
+            lex[row][col] = fuzz.partial_ratio(self.index.clean[pos], self.words_clean[i])
+            inexact[row][col] = False
+        return lex[row][col]
+
+    def phonetic(self, pos: int, i: int) -> int:
+        (_, pho, _), row, col = self._tile(pos, i)
+        return pho[row][col]
+
+
+def _apply_conventions(scores: np.ndarray, rows: List[str], cols: List[str]) -> np.ndarray:
+    rows_arr = np.array(rows, dtype=str)[:, None]
+    cols_arr = np.array(cols, dtype=str)[None, :]
+    empty = (np.char.str_len(rows_arr) == 0) | (np.char.str_len(cols_arr) == 0)
+    scores = np.where(empty, 0, scores)
+    return np.where(rows_arr == cols_arr, 100, scores).astype(np.int16)
+
+
+def _ratio_matrix(rows: List[str], cols: List[str]) -> np.ndarray:
+    if not rows or not cols:
+        return np.zeros((len(rows), len(cols)), dtype=np.int16)
+    dist = process.cdist(rows, cols, scorer=Indel.distance, dtype=np.int32)
+    lensum = np.array([len(r) for r in rows])[:, None] + np.array([len(c) for c in cols])[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # same float ops as Levenshtein.ratio, so rounding matches fuzzywuzzy exactly
+        scores = np.rint(100 * ((lensum - dist) / lensum))
+    return _apply_conventions(np.nan_to_num(scores), rows, cols)
+
+
+def _partial_ratio_bounds(rows: List[str], cols: List[str], phonetic: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """rapidfuzz `partial_ratio` scores, and a mask of the cells that need fuzzywuzzy's exact one."""
+    if not rows or not cols:
+        empty = np.zeros((len(rows), len(cols)), dtype=np.int16)
+        return empty, empty.astype(bool)
+    # Imported here: compare imports this module for its scorers
+    from utils.compare import COMBINED_THRESHOLD, MAX_LEEWAY, PHONETIC_THRESHOLD, SHORT_WORD_THRESHOLD
+
+    scores = _apply_conventions(np.rint(process.cdist(rows, cols, scorer=rf_fuzz.partial_ratio, dtype=np.float64)), rows, cols)
+    # Upper bounds: a cell below every rule even at its bound can't pass, so its exact value never matters
+    inexact = (
+        (scores + phonetic >= 2 * (COMBINED_THRESHOLD - MAX_LEEWAY))
+        | (scores >= SHORT_WORD_THRESHOLD)
+        | (phonetic >= PHONETIC_THRESHOLD - MAX_LEEWAY)  # a phonetic match reports the combined score
+    )
+    # Equal strings are 100 and empty ones 0 in both
+    inexact &= np.array(rows, dtype=str)[:, None] != np.array(cols, dtype=str)[None, :]
+    inexact &= scores > 0
+    return scores, inexact
+
+
+ENGINES = {
+    "pairwise": PairwiseScorer,
+    "cdist": CdistScorer,
+}
+
+
+def make_scorer(index: ReferenceIndex, words_clean: List[str], words_meta: List[str], engine: str = None):
+    engine = engine or SCORING_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown scoring engine: {engine}")
+    return ENGINES[engine](index, words_clean, words_meta)
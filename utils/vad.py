@@ -0,0 +1,96 @@
+from collections import deque
+from typing import Dict
+import numpy as np
+import os
+
+# Gate linear16 audio before it goes upstream ("1" enables it for sessions that declare PCM)
+VAD_ENABLED = os.getenv("RECALLR_VAD", "0") == "1"
+VAD_FRAME_MS = 20
+# Hysteresis: a frame louder than START opens the gate; it closes only after HANGOVER of frames below STOP
+VAD_START_DB = float(os.getenv("RECALLR_VAD_START_DB", "-40"))
+VAD_STOP_DB = float(os.getenv("RECALLR_VAD_STOP_DB", "-50"))
+VAD_HANGOVER_MS = int(os.getenv("RECALLR_VAD_HANGOVER_MS", "500"))
+# Separately, a frame between STOP and START also opens the gate if its ZCR is above this: onsets
+# on an unvoiced consonant (s, f, th) are noisy-sounding and quieter than voiced ones
+VAD_FRICATIVE_ZCR = 0.25
+# Silent audio sent ahead of an onset so the start of the first word isn't clipped
+VAD_PREPAD_MS = 200
+
+
+class EnergyVAD:
+    """Energy + zero-crossing-rate voice activity gate for 16-bit PCM.
+
+    `process` takes chunks of any size, splits them into fixed frames and
+    returns only the audio to forward, which is empty while the speaker is
+    silent. Per-frame energy and ZCR are computed for a whole chunk at once
+    with NumPy; only the gate's open/closed state is walked frame by frame.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, frame_ms: int = VAD_FRAME_MS,
+                 start_db: float = VAD_START_DB, stop_db: float = VAD_STOP_DB, hangover_ms: int = VAD_HANGOVER_MS):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_ms = frame_ms
+        self.start_db = start_db
+        self.stop_db = stop_db
+        self.frame_bytes = sample_rate * frame_ms // 1000 * channels * 2
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+
+        self.active = False
+        self.frames = 0
+        self.suppressed_frames = 0
+
+        self._quiet = 0          # frames below the stop threshold since the gate last heard speech
+        self._remainder = b""    # partial frame carried into the next chunk
+        self._prepad = deque(maxlen=max(1, VAD_PREPAD_MS // frame_ms))
+
+    def process(self, data: bytes) -> bytes:
+        data = self._remainder + data
+        count = len(data) // self.frame_bytes
+        self._remainder = data[count * self.frame_bytes:]
+        if count == 0:
+            return b""
+
+        energy, zcr = self._features(data[:count * self.frame_bytes], count)
+        sustained = energy >= self.stop_db
+        onset = (energy >= self.start_db) | (sustained & (zcr >= VAD_FRICATIVE_ZCR))
+
+        out = []
+        for k in range(count):
+            frame = data[k * self.frame_bytes:(k + 1) * self.frame_bytes]
+            if not self.active and onset[k]:
+                self.active = True
+                out.extend(self._prepad)
+                self._prepad.clear()
+
+            if self.active:
+                self._quiet = 0 if sustained[k] else self._quiet + 1
+                if self._quiet > self.hangover_frames:
+                    self.active = False
+
+            self.frames += 1
+            if self.active:
+                out.append(frame)
+            else:
+                if len(self._prepad) == self._prepad.maxlen:
+                    self.suppressed_frames += 1  # the oldest pre-pad frame is never sent
+                self._prepad.append(frame)
+        return b"".join(out)
+
+    def stats(self) -> Dict[str, float]:
+        seconds = self.frames * self.frame_ms / 1000
+        suppressed = self.suppressed_frames * self.frame_ms / 1000
+        return {
+            "audio_s": round(seconds, 1),
+            "suppressed_s": round(suppressed, 1),
+            "suppressed_ratio": round(suppressed / seconds, 3) if seconds else 0,
+        }
+
+    def _features(self, data: bytes, count: int):
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32).reshape(count, -1, self.channels)
+        mono = samples.mean(axis=2) / 32768.0
+        power = np.mean(mono * mono, axis=1)
+        energy = 10 * np.log10(power + 1e-10)
+        signs = np.signbit(mono)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (mono.shape[1] - 1)
+        return energy, zcr
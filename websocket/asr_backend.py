@@ -0,0 +1,58 @@
+from typing import Callable, Optional, Protocol
+from utils.reference_index import ReferenceIndex
+import os
+
+# "deepgram" streams to the live API, "fake" emits scripted transcripts in-process (load tests, offline runs)
+ASR_BACKEND = os.getenv("RECALLR_ASR_BACKEND", "deepgram")
+ASR_BACKENDS = ("deepgram", "fake")
+# Chunks a backend may hold unsent before the session's audio sender waits
+ASR_MAX_BACKLOG = int(os.getenv("RECALLR_ASR_MAX_BACKLOG", "8"))
+# Seconds of sent audio kept to replay into a replacement connection after the upstream drops
+ASR_REPLAY_SECONDS = float(os.getenv("RECALLR_ASR_REPLAY_SECONDS", "5"))
+# Attempts to reopen a dropped connection before the session gives up on ASR; a reopened
+# connection that dies again before it proves stable counts as a failed attempt
+ASR_RECONNECT_ATTEMPTS = int(os.getenv("RECALLR_ASR_RECONNECT_ATTEMPTS", "5"))
+# Uptime after which a reopened connection is stable even if it has only recognized replayed audio
+ASR_STABLE_SECONDS = float(os.getenv("RECALLR_ASR_STABLE_SECONDS", "10"))
+
+# Called with each Deepgram-shaped response: {"channel": {"alternatives": [...]}, "is_final": ...}
+ResultHandler = Callable[[dict], None]
+
+
+class ASRBackend(Protocol):
+    """One streaming recognition session, as the websocket session uses it.
+
+    Results are delivered to `on_result` in Deepgram's live response shape,
+    whatever the backend, so the aligner path is the same for all of them.
+    A backend that sets `needs_script` is opened only once the script is
+    indexed, and is given its index. `done` turns true once the stream has
+    ended, whether by `finish()` or because the connection dropped.
+    """
+
+    on_result: ResultHandler
+    needs_script: bool
+    done: bool
+
+    async def open(self, audio_format: Optional[dict] = None, script: Optional[ReferenceIndex] = None) -> None: ...
+
+    def send_audio(self, data: bytes) -> None: ...
+
+    def keep_alive(self) -> None: ...
+
+    def backlog(self) -> int: ...
+
+    async def finish(self) -> None: ...
+
+    def stats(self) -> dict: ...
+
+
+def make_backend(on_result: ResultHandler, name: str = None) -> ASRBackend:
+    name = name or ASR_BACKEND
+    if name not in ASR_BACKENDS:
+        raise ValueError(f"Unknown ASR backend: {name}")
+    # Imported on demand so the fake runs without the Deepgram SDK configured
+    if name == "deepgram":
+        from websocket.deepgram_client import DeepgramBackend
+        return DeepgramBackend(on_result)
+    from websocket.fake_asr import FakeBackend
+    return FakeBackend(on_result)
@@ -0,0 +1,121 @@
+from collections import deque
+from typing import Awaitable, Callable, Optional
+import asyncio
+import os
+import time
+
+# Idle live connections kept open ahead of demand (0 disables pooling)
+ASR_POOL_SIZE = int(os.getenv("DEEPGRAM_POOL_SIZE", "2"))
+# Deepgram closes a live socket after ~10 s without audio, so idle ones are pinged well within that
+ASR_KEEPALIVE_SECONDS = float(os.getenv("DEEPGRAM_KEEPALIVE_SECONDS", "4"))
+
+
+class ASRPool:
+    """Pre-opened live ASR connections that sessions can check out instantly.
+
+    `connect` is any coroutine function returning a live connection with
+    `send`, `keep_alive`, `finish` and a `done` flag, so tests can point the
+    pool at a stand-in server. Idle connections are pinged with `keep_alive()`
+    and dropped once closed; every checkout schedules a background refill, and
+    a checkout from an empty pool (a miss) connects inline.
+    """
+
+    def __init__(self, connect: Callable[[], Awaitable], size: int = ASR_POOL_SIZE, keepalive_seconds: float = ASR_KEEPALIVE_SECONDS):
+        self.connect = connect
+        self.size = size
+        self.keepalive_seconds = keepalive_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.connects = 0
+        self.total_connect_time = 0.0
+        self.max_connect_time = 0.0
+
+        self._idle = deque()
+        self._opening = 0
+        self._tasks = set()
+        self._keepalive_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._keepalive_task is None and self.size > 0:
+            self._keepalive_task = asyncio.create_task(self._keep_alive())
+            self._replenish()
+
+    async def acquire(self):
+        """An open connection, from the pool if one is idle, else a fresh one."""
+        self.start()
+        while self._idle:
+            connection = self._idle.popleft()
+            if not connection.done:
+                self.hits += 1
+                self._replenish()
+                return connection
+
+        self.misses += 1
+        self._replenish()
+        return await self._open()
+
+    async def close(self):
+        for task in [self._keepalive_task, *self._tasks]:
+            if task is not None:
+                task.cancel()
+        self._keepalive_task = None
+        while self._idle:
+            connection = self._idle.popleft()
+            try:
+                await connection.finish()
+            except Exception as e:
+                print(f"⚠️ Failed to close pooled connection: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "avg_connect_ms": round(1000 * self.total_connect_time / self.connects, 1) if self.connects else 0,
+            "max_connect_ms": round(1000 * self.max_connect_time, 1),
+        }
+
+    async def _open(self):
+        started = time.monotonic()
+        try:
+            connection = await self.connect()
+        except Exception:
+            self.failures += 1
+            raise
+        elapsed = time.monotonic() - started
+        self.connects += 1
+        self.total_connect_time += elapsed
+        self.max_connect_time = max(self.max_connect_time, elapsed)
+        return connection
+
+    def _replenish(self):
+        missing = self.size - len(self._idle) - self._opening
+        for _ in range(max(0, missing)):
+            self._opening += 1
+            task = asyncio.create_task(self._fill())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fill(self):
+        try:
+            self._idle.append(await self._open())
+        except Exception as e:
+            print(f"⚠️ Failed to pre-open ASR connection: {e}")
+        finally:
+            self._opening -= 1
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(self.keepalive_seconds)
+            live = [connection for connection in self._idle if not connection.done]
+            if len(live) < len(self._idle):
+                self._idle = deque(live)
+                self._replenish()
+            for connection in live:
+                try:
+                    connection.keep_alive()
+                except Exception as e:
+                    print(f"⚠️ Failed to ping pooled connection: {e}")
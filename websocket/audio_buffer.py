@@ -0,0 +1,117 @@
+from collections import deque
+from typing import List
+import asyncio
+import os
+import time
+
+AUDIO_BUFFER_MS = int(os.getenv("RECALLR_AUDIO_BUFFER_MS", "5000"))
+# "drop-oldest" keeps the freshest audio; "block" stops reading the client socket (TCP backpressure)
+AUDIO_OVERFLOW = os.getenv("RECALLR_AUDIO_OVERFLOW", "drop-oldest")
+# Assumed byte rate of compressed MediaRecorder audio (~32 kbps) when the client doesn't declare one
+AUDIO_BYTES_PER_MS = int(os.getenv("RECALLR_AUDIO_BYTES_PER_MS", "4"))
+# Newest audio held back while paused and sent on resume, so the first words after it aren't lost
+PAUSE_PREROLL_MS = int(os.getenv("RECALLR_PAUSE_PREROLL_MS", "1000"))
+
+OVERFLOW_POLICIES = ("drop-oldest", "block")
+
+
+class AudioBuffer:
+    """Bounded per-session audio queue between websocket ingress and the ASR sender.
+
+    Capacity is given in milliseconds of audio and converted with
+    `bytes_per_ms`. With "drop-oldest" a full buffer discards the oldest
+    chunks; with "block", `put` waits for room, which stalls the receive loop
+    and lets TCP push back on the client. A chunk put with `pin` goes to the
+    front and is never dropped, for a container header later chunks depend on.
+    """
+
+    def __init__(self, capacity_ms: int = AUDIO_BUFFER_MS, bytes_per_ms: int = AUDIO_BYTES_PER_MS, overflow: str = AUDIO_OVERFLOW):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audio overflow policy: {overflow}")
+        self.capacity_ms = capacity_ms
+        self.bytes_per_ms = bytes_per_ms
+        self.overflow = overflow
+
+        self.depth_bytes = 0
+        self.dropped_chunks = 0
+        self.dropped_bytes = 0
+        self.delivered_chunks = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+        self._chunks = deque()  # (audio, arrival time)
+        self._pinned = False    # the oldest chunk must not be dropped
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    @property
+    def capacity_bytes(self) -> int:
+        return self.capacity_ms * self.bytes_per_ms
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def depth_ms(self) -> float:
+        return self.depth_bytes / self.bytes_per_ms
+
+    async def put(self, data: bytes, pin: bool = False):
+        if self.overflow == "block":
+            while self._chunks and self.depth_bytes + len(data) > self.capacity_bytes:
+                self._not_full.clear()
+                await self._not_full.wait()
+        self.put_nowait(data, pin)
+
+    def put_nowait(self, data: bytes, pin: bool = False):
+        """Add a chunk without waiting, dropping the oldest unpinned audio if full."""
+        while len(self._chunks) > self._pinned and self.depth_bytes + len(data) > self.capacity_bytes:
+            if self._pinned:
+                old, _ = self._chunks[1]
+                del self._chunks[1]
+            else:
+                old, _ = self._chunks.popleft()
+            self.depth_bytes -= len(old)
+            self.dropped_chunks += 1
+            self.dropped_bytes += len(old)
+
+        if pin:
+            self._chunks.appendleft((data, time.monotonic()))
+            self._pinned = True
+        else:
+            self._chunks.append((data, time.monotonic()))
+        self.depth_bytes += len(data)
+        self._not_empty.set()
+
+    async def get(self) -> bytes:
+        while not self._chunks:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        data, arrived = self._chunks.popleft()
+        self._pinned = False
+        self.depth_bytes -= len(data)
+        self._not_full.set()
+
+        delay = time.monotonic() - arrived
+        self.delivered_chunks += 1
+        self.total_delay += delay
+        self.max_delay = max(self.max_delay, delay)
+        return data
+
+    def drain(self) -> List[bytes]:
+        """Remove and return everything buffered, oldest first."""
+        chunks = [data for data, _ in self._chunks]
+        self._chunks.clear()
+        self._pinned = False
+        self.depth_bytes = 0
+        self._not_full.set()
+        return chunks
+
+    def stats(self) -> dict:
+        return {
+            "depth_ms": round(self.depth_ms()),
+            "dropped_chunks": self.dropped_chunks,
+            "dropped_ms": round(self.dropped_bytes / self.bytes_per_ms),
+            "avg_delay_ms": round(1000 * self.total_delay / self.delivered_chunks, 1) if self.delivered_chunks else 0,
+            "max_delay_ms": round(1000 * self.max_delay, 1),
+        }
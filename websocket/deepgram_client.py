@@ -1,99 +1,122 @@
+from collections import deque
 from deepgram import Deepgram
-from starlette.websockets import WebSocketState
-from utils.compare import compare_transcript
-import os
+from deepgram.transcription import LiveTranscription
+from typing import Optional
+from utils.keywords import KEYWORD_LIMIT, script_keywords
+from utils.reference_index import ReferenceIndex
+from websocket.asr_backend import ResultHandler
+from websocket.asr_pool import ASRPool
 import asyncio
-import json
+import os
 from dotenv import load_dotenv
 
 load_dotenv()
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
-dg_client = Deepgram(DEEPGRAM_API_KEY)
-
-async def init_deepgram(reference_script, confirmed_words, websocket, ready_event):
-    word_index = 0
-    control_state = {"paused": False}
-
-    try:
-        dg_connection = await dg_client.transcription.live({
-            "punctuate": True,
-            "interim_results": True
-        })
-
-        print(f"🧪 dg_connection type: {type(dg_connection)}")
-        print(f"🧪 dg_connection.send: {getattr(dg_connection, 'send', None)}")
-
-        def on_transcript(transcript, **kwargs):
-            nonlocal word_index
-            if control_state["paused"]:
-                print("⏸️ Paused: Skipping transcript processing.")
-                return
-
-            words = (
-                transcript.get("channel", {})
-                .get("alternatives", [{}])[0]
-                .get("transcript", "")
-                .split()
-            )
-            print("🎧 Deepgram words:", words)
-
-            feedback = compare_transcript(reference_script[word_index:], words)
-
-            for i, (matched_word, correct) in enumerate(feedback):
-                abs_index = word_index + i
-                if abs_index >= len(reference_script):
-                    break
-
-                expected_word = reference_script[abs_index]
-
-                if correct:
-                    confirmed_words[abs_index]["correct"] = True
-
-            while word_index < len(confirmed_words) and confirmed_words[word_index].get("correct"):
-                word_index += 1
-
-            print("🧪 Launching safe_send task")
-
-            async def safe_send():
-                try:
-                    if websocket.client_state == WebSocketState.CONNECTED:
-                        await websocket.send_text(json.dumps({
-                            "type": "transcript",
-                            "payload": confirmed_words
-                        }))
-                    else:
-                        print("⚠️ WebSocket is closed in safe_send")
-                except Exception as e:
-                    print(f"⚠️ Failed to send: {e}")
-
-            asyncio.create_task(safe_send())
-
-        async def listen_for_control():
-            while websocket.client_state == WebSocketState.CONNECTED:
-                try:
-                    msg = await websocket.receive_text()
-                    data = json.loads(msg)
-
-                    if data.get("type") == "pause":
-                        control_state["paused"] = True
-                        print("⏸️ Received pause command.")
-                    elif data.get("type") == "resume":
-                        control_state["paused"] = False
-                        print("▶️ Received resume command.")
-                except Exception as e:
-                    print(f"⚠️ Error receiving control message: {e}")
-                    break
-
-        dg_connection.registerHandler(dg_connection.event.TRANSCRIPT_RECEIVED, on_transcript)
-
-        # Start listening for pause/resume commands
-        asyncio.create_task(listen_for_control())
-
-        ready_event.set()
-        return dg_connection
-
-    except Exception as e:
-        print(f"❌ Error setting up Deepgram: {e}")
-        if websocket.client_state == WebSocketState.CONNECTED:
-            websocket.close()
-        return None
\ No newline at end of file
+# Base URL of the API, e.g. http://127.0.0.1:8765 for tools/deepgram_standin.py (SDK default if unset)
+DEEPGRAM_API_URL = os.getenv("DEEPGRAM_API_URL")
+
+# Parsed responses kept on the connection for debugging (the SDK keeps all of them)
+ASR_KEEP_RECEIVED = int(os.getenv("RECALLR_ASR_KEEP_RECEIVED", "0"))
+# Hard cap on the SDK queue; audio beyond it is dropped rather than buffered without bound
+ASR_MAX_QUEUE = int(os.getenv("RECALLR_ASR_MAX_QUEUE", "256"))
+# Longest wait for Deepgram to flush results on close; the SDK's finish() would wait forever on a dead socket
+ASR_FINISH_SECONDS = float(os.getenv("RECALLR_ASR_FINISH_SECONDS", "5"))
+
+_dg_client: Optional[Deepgram] = None
+
+def get_client() -> Deepgram:
+    # Created on first use, so the app loads (e.g. with the fake backend) without a valid key
+    global _dg_client
+    if _dg_client is None:
+        options = {"api_key": DEEPGRAM_API_KEY}
+        if DEEPGRAM_API_URL:
+            options["api_url"] = DEEPGRAM_API_URL
+        _dg_client = Deepgram(options)
+    return _dg_client
+
+class BoundedLiveTranscription(LiveTranscription):
+    """LiveTranscription whose memory use stays flat over long sessions.
+
+    The SDK appends every parsed response to `received` and never trims it;
+    here it is a deque holding at most `ASR_KEEP_RECEIVED` responses. The
+    send/receive `_queue` is shared with incoming responses, so it can't be
+    given a maxsize without breaking the receiver; instead `send` drops audio
+    once the queue holds `ASR_MAX_QUEUE` items. Control messages (KeepAlive,
+    CloseStream) always go through.
+    """
+
+    def __init__(self, options, transcription_options, endpoint=None):
+        super().__init__(options, transcription_options, endpoint)
+        self.received = deque(maxlen=ASR_KEEP_RECEIVED)
+        self.dropped_chunks = 0
+
+    def send(self, data) -> None:
+        if isinstance(data, bytes) and self._queue.qsize() >= ASR_MAX_QUEUE:
+            self.dropped_chunks += 1
+            return
+        super().send(data)
+
+LIVE_OPTIONS = {
+    "punctuate": True,
+    "interim_results": True
+}
+
+async def open_live(options: dict = LIVE_OPTIONS):
+    # Same as dg_client.transcription.live(), but with the bounded subclass
+    return await BoundedLiveTranscription(get_client().options, options, "/listen")()
+
+# Started with the app; sessions check connections out of it instead of dialing Deepgram
+asr_pool = ASRPool(open_live)
+
+class DeepgramBackend:
+    """ASRBackend over a Deepgram v2 live connection."""
+
+    # Keyword boosting needs the script before the connection is opened
+    needs_script = KEYWORD_LIMIT > 0
+
+    def __init__(self, on_result: ResultHandler):
+        self.on_result = on_result
+        self.connection = None
+
+    async def open(self, audio_format: Optional[dict] = None, script: Optional[ReferenceIndex] = None):
+        keywords = script_keywords(script) if script is not None else []
+        if keywords:
+            print(f"🔑 Boosting {len(keywords)} script keywords: {keywords[:8]}")
+
+        if audio_format or keywords:
+            # Encoding and keywords are fixed per connection, so these can't use the pooled ones
+            options = {**LIVE_OPTIONS, **(audio_format or {})}
+            if keywords:
+                options["keywords"] = keywords
+            self.connection = await open_live(options)
+        else:
+            self.connection = await asr_pool.acquire()
+
+        print(f"🧪 dg_connection type: {type(self.connection)}")
+        self.connection.register_handler(self.connection.event.TRANSCRIPT_RECEIVED, self.on_result)
+
+    @property
+    def done(self) -> bool:
+        # The SDK only sets done on a clean close; an abnormal one just leaves the socket closed
+        return self.connection.done or self.connection._socket.closed
+
+    def send_audio(self, data: bytes):
+        self.connection.send(data)
+
+    def keep_alive(self):
+        self.connection.keep_alive()
+
+    def backlog(self) -> int:
+        # LiveTranscription.send() does put_nowait() into _queue, which the SDK drains as it writes
+        return self.connection._queue.qsize()
+
+    async def finish(self):
+        if self.done:
+            return  # nothing left to flush, and the SDK would never see the close
+        try:
+            await asyncio.wait_for(self.connection.finish(), ASR_FINISH_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Deepgram did not close within {ASR_FINISH_SECONDS:g}s")
+
+    def stats(self) -> dict:
+        return {"pool": asr_pool.stats(), "dropped_chunks": self.connection.dropped_chunks}
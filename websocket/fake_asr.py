@@ -0,0 +1,170 @@
+from typing import List, Optional
+from utils.reference_index import ReferenceIndex
+from websocket.asr_backend import ResultHandler
+import asyncio
+import hashlib
+import json
+import os
+import random
+
+# Transcript the fake "hears", one utterance per line; defaults to reading the session's script
+FAKE_TRANSCRIPT = os.getenv("RECALLR_FAKE_TRANSCRIPT")
+FAKE_LATENCY_MS = int(os.getenv("RECALLR_FAKE_LATENCY_MS", "0"))
+# Words revealed per audio chunk, or per this many audio bytes when set (pacing by audio, not chunks)
+FAKE_WORDS_PER_CHUNK = int(os.getenv("RECALLR_FAKE_WORDS_PER_CHUNK", "1"))
+FAKE_BYTES_PER_WORD = int(os.getenv("RECALLR_FAKE_BYTES_PER_WORD", "0"))
+# Words per utterance when reading the script
+FAKE_UTTERANCE_WORDS = int(os.getenv("RECALLR_FAKE_UTTERANCE_WORDS", "8"))
+# Fraction of words replaced with a misrecognition, and chunks after which the stream dies (0 = never)
+FAKE_ERROR_RATE = float(os.getenv("RECALLR_FAKE_ERROR_RATE", "0"))
+FAKE_DROP_AFTER = int(os.getenv("RECALLR_FAKE_DROP_AFTER", "0"))
+FAKE_SEED = int(os.getenv("RECALLR_FAKE_SEED", "0"))
+
+# Seconds of speech per word, for the word timings in results
+_WORD_SECONDS = 0.4
+_MISHEARD = ["uh", "um", "the", "and", "a", "okay"]
+
+
+class FakeBackend:
+    """In-process ASRBackend that "recognizes" a fixed transcript, for offline and load tests.
+
+    Each audio chunk reveals the next `words_per_chunk` words (or, with
+    `bytes_per_word`, one word per that many bytes of audio): the open
+    utterance goes out as an interim result, and as a final once it is
+    complete. Results use Deepgram's live response shape, including a
+    `words` array with timings, and arrive `latency_ms` after the chunk.
+    Given the same seed and chunk count the output is identical, including
+    injected errors: misheard words at `error_rate`, and a dead stream after
+    `drop_after` chunks (further audio is ignored, as by a closed socket).
+    """
+
+    needs_script = FAKE_TRANSCRIPT is None
+
+    def __init__(self, on_result: ResultHandler, transcript: Optional[List[List[str]]] = None,
+                 latency_ms: int = FAKE_LATENCY_MS, words_per_chunk: int = FAKE_WORDS_PER_CHUNK, bytes_per_word: int = FAKE_BYTES_PER_WORD,
+                 error_rate: float = FAKE_ERROR_RATE, drop_after: int = FAKE_DROP_AFTER, seed: int = FAKE_SEED):
+        self.on_result = on_result
+        self.latency_ms = latency_ms
+        self.words_per_chunk = words_per_chunk
+        self.bytes_per_word = bytes_per_word
+        self.error_rate = error_rate
+        self.drop_after = drop_after
+
+        self.done = False
+        self.chunks = 0
+        self.audio_bytes = 0
+        self.results = 0
+        self.misheard = 0
+
+        self._utterances = transcript
+        self._random = random.Random(seed)
+        self._utterance = 0     # index into _utterances
+        self._heard = 0         # words of the current utterance revealed so far
+        self._words: List[dict] = []
+        self._clock = 0.0       # audio seconds "spoken" before the current utterance
+        self._pending = 0       # results scheduled but not yet delivered
+        self._revealed = 0      # words revealed in total
+        self._audio_hash = hashlib.sha256()
+
+    async def open(self, audio_format: Optional[dict] = None, script: Optional[ReferenceIndex] = None):
+        if self._utterances is None:
+            if FAKE_TRANSCRIPT is not None:
+                with open(FAKE_TRANSCRIPT, encoding="utf-8") as f:
+                    self._utterances = [line.split() for line in f if line.strip()]
+            else:
+                words = script.words if script is not None else []
+                self._utterances = [words[i:i + FAKE_UTTERANCE_WORDS] for i in range(0, len(words), FAKE_UTTERANCE_WORDS)]
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    def send_audio(self, data: bytes):
+        if self.done:
+            return
+        self.chunks += 1
+        if self.drop_after and self.chunks > self.drop_after:
+            self.done = True
+            print("💀 Fake ASR stream dropped")
+            return
+        self.audio_bytes += len(data)
+        self._audio_hash.update(data)
+
+        if self.bytes_per_word:
+            count = self.audio_bytes // self.bytes_per_word - self._revealed
+        else:
+            count = self.words_per_chunk
+        for _ in range(count):
+            if self._utterance >= len(self._utterances):
+                return
+            utterance = self._utterances[self._utterance]
+            self._reveal(utterance[self._heard])
+            self._heard += 1
+            self._revealed += 1
+            final = self._heard == len(utterance)
+            self._emit(final)
+            if final:
+                self._utterance += 1
+                self._heard = 0
+                self._clock += len(self._words) * _WORD_SECONDS
+                self._words = []
+
+    def keep_alive(self):
+        pass
+
+    def backlog(self) -> int:
+        return self._pending
+
+    async def finish(self):
+        if self._words and not self.done:
+            self._emit(True)
+        self._deliver({
+            "type": "Metadata",
+            "sha256": self._audio_hash.hexdigest(),
+            "duration": self._clock + len(self._words) * _WORD_SECONDS,
+            "channels": 1,
+        })
+        while self._pending:
+            await asyncio.sleep(self.latency_ms / 1000)
+        self.done = True
+
+    def stats(self) -> dict:
+        return {"chunks": self.chunks, "bytes": self.audio_bytes, "results": self.results, "misheard": self.misheard}
+
+    def _reveal(self, word: str):
+        confidence = round(0.75 + 0.25 * self._random.random(), 3)
+        if self.error_rate and self._random.random() < self.error_rate:
+            # like a real recognizer, less sure of the words it gets wrong
+            word = self._random.choice(_MISHEARD)
+            confidence = round(confidence - 0.4, 3)
+            self.misheard += 1
+        start = self._clock + len(self._words) * _WORD_SECONDS
+        self._words.append({"word": word.lower(), "punctuated_word": word, "start": round(start, 2),
+                            "end": round(start + _WORD_SECONDS, 2), "confidence": confidence})
+
+    def _emit(self, final: bool):
+        words = list(self._words)
+        self._deliver({
+            "type": "Results",
+            "is_final": final,
+            "speech_final": final,
+            "start": self._clock,
+            "duration": len(words) * _WORD_SECONDS,
+            "channel": {"alternatives": [{
+                "transcript": " ".join(w["punctuated_word"] for w in words),
+                "confidence": min((w["confidence"] for w in words), default=0),
+                "words": words,
+            }]},
+        })
+
+    def _deliver(self, response: dict):
+        self.results += 1
+        if not self.latency_ms:
+            self.on_result(response)
+            return
+        # Round-trip through JSON like a real socket, so handlers can't mutate shared state
+        body = json.dumps(response)
+        self._pending += 1
+        asyncio.get_running_loop().call_later(self.latency_ms / 1000, self._arrive, body)
+
+    def _arrive(self, body: str):
+        self._pending -= 1
+        self.on_result(json.loads(body))
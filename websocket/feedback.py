@@ -0,0 +1,75 @@
+from typing import List, Optional
+from utils.progress import SessionProgress
+import os
+
+# Frames between unsolicited full snapshots (0 disables)
+SNAPSHOT_EVERY = int(os.getenv("RECALLR_SNAPSHOT_EVERY", "100"))
+# Unchanged words allowed inside one delta range before it is split
+RANGE_GAP = 8
+
+
+class FeedbackEncoder:
+    """Versioned feedback frames for one session.
+
+    Instead of re-sending every word with its flags, frames carry only the
+    index ranges whose state changed since the previous frame, as digit
+    strings (0 unseen, 1 provisional, 2 correct, 3 skipped):
+
+        {"type": "delta", "seq": 12, "changes": [[40, "2222"], [57, "1"]]}
+
+    `seq` increases by one per frame of either kind. A client that sees a gap
+    asks for {"type": "resync"}; snapshots also go out on connect and every
+    `snapshot_every` frames:
+
+        {"type": "snapshot", "seq": 13, "script_hash": "...", "states": "2222..."}
+    """
+
+    def __init__(self, progress: SessionProgress, snapshot_every: int = SNAPSHOT_EVERY, seq: int = 0):
+        self.progress = progress
+        self.snapshot_every = snapshot_every
+        self.seq = seq  # continued across script swaps so the client never sees it go back
+        self._since_snapshot = 0
+        self._snapshot_requested = True
+
+    def request_snapshot(self):
+        self._snapshot_requested = True
+
+    def pending(self) -> bool:
+        return self._snapshot_requested or bool(self.progress.changed)
+
+    def next_frame(self) -> Optional[dict]:
+        """Frame covering every change since the last one, or None if nothing changed."""
+        if not self.pending():
+            return None
+
+        self.seq += 1
+        if self._snapshot_requested or (self.snapshot_every and self._since_snapshot >= self.snapshot_every):
+            self.progress.take_changes()
+            self._snapshot_requested = False
+            self._since_snapshot = 0
+            return {
+                "type": "snapshot",
+                "seq": self.seq,
+                "script_hash": self.progress.index.script_hash,
+                "states": self.progress.encode(),
+            }
+
+        self._since_snapshot += 1
+        return {
+            "type": "delta",
+            "seq": self.seq,
+            "changes": [
+                [start, self.progress.encode(start, end)]
+                for start, end in _ranges(self.progress.take_changes())
+            ],
+        }
+
+
+def _ranges(positions: List[int]) -> List[List[int]]:
+    ranges = []
+    for pos in positions:
+        if ranges and pos - ranges[-1][1] <= RANGE_GAP:
+            ranges[-1][1] = pos + 1
+        else:
+            ranges.append([pos, pos + 1])
+    return ranges
@@ -1,19 +1,16 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from starlette.websockets import WebSocketState
-from websocket.deepgram_client import init_deepgram
-import asyncio
+from websocket.session import Session
 import json
 
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     print("✅ Client connected")
 
-    reference_script = []
-    confirmed_words = []
-    dg_connection = None
-    deepgram_ready = asyncio.Event()
+    session = Session(websocket)
+    session.start()
 
     try:
+        # The only reader of this socket: every frame is read once and routed by type
         while True:
             try:
                 message = await websocket.receive()
@@ -21,42 +18,32 @@ async def websocket_endpoint(websocket: WebSocket):
                 print(f"⚠️ Client likely disconnected: {e}")
                 break
 
-            if "text" in message:
-                data = json.loads(message["text"])
+            if message["type"] == "websocket.disconnect":
+                print("❌ WebSocket disconnected")
+                break
 
-                if data.get("type") == "script":
-                    reference_script = data["payload"].split()
-                    confirmed_words = [{"word": word, "correct": False} for word in reference_script]
+            if message.get("bytes") is not None:
+                await session.on_audio(message["bytes"])
 
-                    dg_connection = await init_deepgram(
-                        reference_script,
-                        confirmed_words,
-                        websocket,
-                        deepgram_ready
-                    )
+            elif message.get("text") is not None:
+                try:
+                    data = json.loads(message["text"])
+                except ValueError:
+                    print(f"⚠️ Ignoring malformed message: {message['text'][:80]}")
+                    continue
+
+                if data.get("type") == "script":
+                    session.on_script(data)
 
                 elif data.get("type") == "end":
                     print("🛑 Session end requested")
                     break
 
-            elif "bytes" in message:
-                await deepgram_ready.wait()
-
-                if dg_connection:
-                    try:
-                        dg_connection.send(message["bytes"])
-                    except Exception as e:
-                        print(f"💥 Failed to send audio: {e}")
+                elif not session.on_control(data):
+                    print(f"⚠️ Unknown message type: {data.get('type')}")
 
     except WebSocketDisconnect:
         print("❌ WebSocket disconnected")
 
     finally:
-        if dg_connection and hasattr(dg_connection, "finish"):
-            await dg_connection.finish()
-            print("🔚 Deepgram connection closed")
-        if websocket.client_state == WebSocketState.CONNECTED:
-            await websocket.close()
-            print("🔒 WebSocket connection closed")
-        else:
-            print("⚠️ WebSocket was already closed")
+        await session.close()
@@ -0,0 +1,96 @@
+from collections import deque
+from starlette.websockets import WebSocketState
+from typing import Optional
+from websocket.feedback import FeedbackEncoder
+import asyncio
+import json
+import os
+
+# Non-feedback messages held for a slow client before the oldest is dropped
+OUTBOUND_MAX_PENDING = int(os.getenv("RECALLR_OUTBOUND_MAX_PENDING", "32"))
+
+
+class OutboundWriter:
+    """The only task that writes to a client websocket.
+
+    Feedback is latest-state-wins: `notify_feedback` only wakes the writer,
+    and the delta is built when the writer is ready to send, so everything
+    that changed while the previous send was in flight goes out as one merged
+    frame. A slow client therefore costs at most one pending feedback frame,
+    and other messages are capped at `max_pending` (oldest dropped first).
+    Frames leave in the order they were built.
+    """
+
+    def __init__(self, websocket, max_pending: int = OUTBOUND_MAX_PENDING):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.feedback: Optional[FeedbackEncoder] = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.notifications = 0
+        self.feedback_frames = 0
+
+        self._messages = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def notify_feedback(self):
+        self.notifications += 1
+        self._wakeup.set()
+
+    def send(self, message: dict):
+        if len(self._messages) >= self.max_pending:
+            self._messages.popleft()
+            self.dropped += 1
+        self._messages.append(message)
+        self._wakeup.set()
+
+    def depth(self) -> int:
+        feedback_pending = self.feedback is not None and self.feedback.pending()
+        return len(self._messages) + int(feedback_pending)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": max(0, self.notifications - self.feedback_frames),
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            while True:
+                if self._messages:
+                    message = self._messages.popleft()
+                elif self.feedback is not None and self.feedback.pending():
+                    message = self.feedback.next_frame()
+                    self.feedback_frames += 1
+                else:
+                    break
+
+                if self.websocket.client_state != WebSocketState.CONNECTED:
+                    print("⚠️ WebSocket is closed in outbound writer")
+                    return
+                try:
+                    await self.websocket.send_text(json.dumps(message))
+                    self.sent += 1
+                except Exception as e:
+                    print(f"⚠️ Failed to send: {e}")
+                    return
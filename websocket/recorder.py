@@ -0,0 +1,58 @@
+from typing import Optional
+import json
+import os
+import time
+import uuid
+
+# Directory for session recordings (unset disables recording)
+RECORD_DIR = os.getenv("RECALLR_RECORD_DIR")
+
+
+class SessionRecorder:
+    """Append-only JSONL log of what one session received, for tools/replay.py.
+
+    One compact line per event, with `t` in seconds since the session began:
+
+        {"t":0.004,"ev":"script","hash":"9f2c...","words":812}
+        {"t":1.532,"ev":"asr","r":{...the ASR response as received...}}
+        {"t":9.870,"ev":"control","data":{"type":"pause"}}
+        {"t":12.410,"ev":"reconnect","time_offset":7.2,"dedupe_until":11.6}
+
+    Audio is not recorded. Script texts are stored once per hash under
+    `scripts/` next to the logs, so replays can rebuild the index.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.session_id = uuid.uuid4().hex[:12]
+        self.path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.session_id}.jsonl")
+        self.events = 0
+
+        os.makedirs(os.path.join(directory, "scripts"), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._started = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> Optional["SessionRecorder"]:
+        return cls(RECORD_DIR) if RECORD_DIR else None
+
+    def record(self, event: str, **fields):
+        line = {"t": round(time.monotonic() - self._started, 3), "ev": event, **fields}
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.events += 1
+
+    def record_script(self, script_hash: str, text: str, words: int):
+        path = script_path(self.directory, script_hash)
+        if not os.path.exists(path):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        self.record("script", hash=script_hash, words=words)
+
+    def close(self):
+        self.record("end")
+        self._file.close()
+        print(f"📼 Recorded {self.events} events to {self.path}")
+
+
+def script_path(directory: str, script_hash: str) -> str:
+    return os.path.join(directory, "scripts", f"{script_hash}.txt")
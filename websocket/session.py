@@ -0,0 +1,452 @@
+from starlette.websockets import WebSocketState
+from utils.aligner import StreamingAligner
+from utils.pcm import PCM_DOWNMIX, TARGET_SAMPLE_RATE, PCMConverter
+from utils.phonetic_cache import phonetic_cache
+from utils.reference_index import ReferenceIndex
+from utils.vad import VAD_ENABLED, EnergyVAD
+from websocket.asr_pool import ASR_KEEPALIVE_SECONDS
+from websocket.audio_buffer import PAUSE_PREROLL_MS, AudioBuffer
+from websocket.asr_backend import ASR_MAX_BACKLOG, ASR_RECONNECT_ATTEMPTS, ASR_REPLAY_SECONDS, ASR_STABLE_SECONDS, make_backend
+from websocket.feedback import FeedbackEncoder
+from websocket.outbound import OutboundWriter
+from websocket.recorder import SessionRecorder
+from collections import deque
+from typing import Optional
+import asyncio
+import time
+
+# Slack when matching word times across a reconnect: timestamps are rounded, and for
+# compressed audio the replay offset is estimated from byte counts
+_REPLAY_TOLERANCE = 0.05
+
+
+class Session:
+    """State of one client connection.
+
+    `websocket_endpoint` is the only reader of the socket; it hands every frame
+    to exactly one of the typed handlers below (audio, script, control).
+    """
+
+    def __init__(self, websocket, backend_factory=make_backend, recorder_factory=SessionRecorder.from_env):
+        self.websocket = websocket
+        self.backend_factory = backend_factory  # on_result -> ASRBackend
+        self.recorder = recorder_factory()  # SessionRecorder or None
+        self.writer = OutboundWriter(websocket)
+        self.aligner = None
+        self.feedback = None
+        self.asr = None  # ASRBackend, once open
+        self.audio = AudioBuffer()
+        self._audio_task = None
+        self._background = set()  # script/connect tasks, held so they aren't collected mid-flight
+        self._connect_task = None
+        self._script_generation = 0
+        self._stale_words = 0
+        self._indexed = asyncio.Event()
+        self._started_at = time.monotonic()
+        self.paused = False
+        self.paused_audio = AudioBuffer(capacity_ms=PAUSE_PREROLL_MS, overflow="drop-oldest")
+        self._keepalive_task = None
+        self._last_sent = time.monotonic()  # last audio or keep-alive sent upstream
+        self._sent_bytes = 0
+        self._lags = 0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._asr_up = asyncio.Event()  # clear while a dropped connection is being replaced
+        self._supervise_task = None
+        self._sent_audio = deque()  # recently sent chunks, replayed into a replacement connection
+        self._sent_audio_bytes = 0
+        self._header = None  # first chunk of undeclared (container) audio, which later chunks depend on
+        self._time_offset = 0.0  # session audio time at which the current connection's clock starts
+        self._heard_until = 0.0  # end time of the last word in a final result
+        self._dedupe_until = None  # words ending by this time were heard before the last reconnect
+        self._attached_at = time.monotonic()
+        self._replay_until = 0.0  # session audio time at the end of the last replay
+        self._asr_stable = True  # the current connection has recognized audio past its replay
+        self.reconnects = 0
+        self._gap_total = 0.0
+        self._gap_max = 0.0
+        self.format = None  # audio format sent upstream, if the client declared one
+        self.converter = None
+        self.vad = None
+        self.ready = asyncio.Event()
+
+        self.control_handlers = {
+            "pause": self.on_pause,
+            "resume": self.on_resume,
+            "resync": self.on_resync,
+            "format": self.on_format,
+        }
+
+    def start(self):
+        self.writer.start()
+
+    # Inbound
+
+    def on_script(self, data: dict):
+        # Indexing and the ASR connection run in the background, in parallel, so the
+        # receive loop keeps reading; audio meanwhile collects in the pre-roll buffer.
+        # A later script only swaps the aligner: the upstream connection is kept.
+        self._started_at = time.monotonic()
+        self._script_generation += 1
+        self._spawn(self._load_script(data["payload"], self._script_generation))
+        if self.asr is None and self._connect_task is None:
+            self._connect_task = self._spawn(self._connect())
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _load_script(self, text: str, generation: int):
+        # Built once per script and shared by sessions on the same script
+        reference_index = await asyncio.to_thread(ReferenceIndex.for_script, text)
+        if generation != self._script_generation:
+            return  # a newer script arrived while this one was indexing
+
+        # Swapped together with no await in between, so no transcript sees a mix of old and new
+        swapped = self.aligner is not None
+        if self.recorder is not None:
+            self.recorder.record_script(reference_index.script_hash, text, len(reference_index))
+        if swapped:
+            # Counters are per aligner; report the outgoing script's before it goes
+            print(f"📈 Alignment: {self.aligner.stats()}")
+        # Words already heard in the open utterance were spoken against the old script
+        self._stale_words = self.aligner.pending_words() if swapped else 0
+        self.aligner = StreamingAligner(reference_index)
+        self.feedback = FeedbackEncoder(self.aligner.progress, seq=self.feedback.seq if swapped else 0)
+        self.writer.feedback = self.feedback
+        if swapped:
+            print(f"🔄 Script swapped ({len(reference_index)} words), keeping the ASR connection")
+        # Initial snapshot so the client starts from a known seq
+        self.writer.notify_feedback()
+        self._indexed.set()
+        self._start_audio()
+
+    async def _connect(self):
+        backend = self.backend_factory(self.on_transcript)
+        script = None
+        if backend.needs_script:
+            # e.g. keyword boosting: the connect waits for the index instead of racing it
+            await self._indexed.wait()
+            script = self.aligner.index
+        try:
+            await backend.open(self.format, script)
+        except Exception as e:
+            print(f"❌ Error setting up ASR: {e}")
+            self.writer.send({"type": "error", "message": "Speech recognition is unavailable"})
+            return
+        finally:
+            self._connect_task = None
+        if self._sent_bytes:
+            # Reopened after reconnecting gave up: resume from recent audio, supervised again
+            self._attach(backend)
+            self._supervise_task = asyncio.create_task(self._supervise())
+            return
+        self.asr = backend
+        self._asr_up.set()
+        self._start_audio()
+
+    def _start_audio(self):
+        # Results are only useful once the aligner exists, so audio waits for both
+        if self.asr is None or self.aligner is None or self._audio_task is not None:
+            return
+        print(f"🚰 ASR ready after {1000 * (time.monotonic() - self._started_at):.0f} ms, flushing {self.audio.depth_ms():.0f} ms of pre-roll")
+        self._audio_task = asyncio.create_task(self._pump_audio())
+        self._keepalive_task = asyncio.create_task(self._keep_alive())
+        self._supervise_task = asyncio.create_task(self._supervise())
+        self.ready.set()
+
+    async def on_audio(self, data: bytes):
+        # Every chunk goes through the converter and VAD, paused or not: both carry state
+        # across chunks, and held chunks must already be in the format declared upstream
+        if self.converter is not None:
+            data = self.converter.process(data)
+        if self.vad is not None:
+            data = self.vad.process(data)
+            if not data:
+                return  # silence; the keep-alive timer holds the upstream open
+        # Undeclared audio is a container stream (WebM): its first chunk holds the header the
+        # decoder needs, so it is pinned and overflow drops the audio after it instead
+        header = self.format is None and self._header is None
+        if header:
+            self._header = data
+        if self.paused:
+            # Nothing goes upstream while paused; only the last moment before resume is kept
+            if PAUSE_PREROLL_MS > 0 or header:
+                self.paused_audio.put_nowait(data, pin=header)
+            return
+        if not self.ready.is_set():
+            # Pre-roll: never block the reader before ASR is up, keep the newest audio
+            self.audio.put_nowait(data, pin=header)
+            return
+        # Only waits when the buffer is full and the overflow policy is "block"
+        await self.audio.put(data, pin=header)
+
+    async def _pump_audio(self):
+        # Single sender from the bounded buffer to ASR; holds back while the upstream is behind
+        while True:
+            data = await self.audio.get()
+            await self._asr_up.wait()
+            asr = self.asr
+            # A dead connection never drains, so stop waiting on it once it has been replaced
+            while asr.backlog() >= ASR_MAX_BACKLOG and asr is self.asr:
+                await asyncio.sleep(0.02)
+            try:
+                self.asr.send_audio(data)
+                self._last_sent = time.monotonic()
+            except Exception as e:
+                print(f"💥 Failed to send audio: {e}")
+            # Kept even if the send failed: a chunk lost with the connection is replayed into the next
+            self._remember_sent(data)
+
+    def _remember_sent(self, data: bytes):
+        self._sent_bytes += len(data)
+        self._sent_audio.append(data)
+        self._sent_audio_bytes += len(data)
+        limit = ASR_REPLAY_SECONDS * 1000 * self.audio.bytes_per_ms
+        while self._sent_audio and self._sent_audio_bytes - len(self._sent_audio[0]) >= limit:
+            self._sent_audio_bytes -= len(self._sent_audio.popleft())
+
+    async def _supervise(self):
+        # A dropped upstream is replaced mid-session instead of silently ending recognition.
+        # Attempts and backoff carry over until a reopened connection proves stable, so an
+        # upstream that keeps dying (e.g. on the replayed audio) backs off and gives up.
+        attempts = 0
+        while True:
+            await asyncio.sleep(0.25)
+            if not self.asr.done:
+                continue
+            if self._asr_stable or time.monotonic() - self._attached_at >= ASR_STABLE_SECONDS:
+                attempts = 0
+            attempts = await self._reconnect(attempts)
+            if attempts is None:
+                return
+
+    async def _reconnect(self, attempts: int) -> Optional[int]:
+        self._asr_up.clear()
+        dropped_at = time.monotonic()
+        print(f"🔌 ASR connection lost, reconnecting with {self._sent_audio_bytes / self.audio.bytes_per_ms:.0f} ms of audio to replay")
+        backend = None
+        while backend is None and attempts < ASR_RECONNECT_ATTEMPTS:
+            if attempts:
+                await asyncio.sleep(min(0.5 * 2 ** (attempts - 1), 8))
+            attempts += 1
+            candidate = self.backend_factory(self.on_transcript)
+            try:
+                await candidate.open(self.format, self.aligner.index if candidate.needs_script else None)
+                backend = candidate
+            except Exception as e:
+                print(f"❌ ASR reconnect attempt {attempts} failed: {e}")
+        if backend is None:
+            print(f"❌ ASR could not be reopened after {ASR_RECONNECT_ATTEMPTS} attempts")
+            self.asr = None  # dead; a later script opens a fresh connection
+            self.writer.send({"type": "error", "message": "Speech recognition is unavailable"})
+            return None
+
+        replayed = self._attach(backend)
+        gap = time.monotonic() - dropped_at
+        self.reconnects += 1
+        self._gap_total += gap
+        self._gap_max = max(self._gap_max, gap)
+        print(f"🔌 ASR reconnected after {1000 * gap:.0f} ms, replayed {replayed} chunks from {self._time_offset:.2f}s")
+        return attempts
+
+    def _attach(self, backend) -> int:
+        # The new connection's clock starts at the oldest replayed chunk; results it repeats
+        # for audio that already produced finals are dropped by word time in on_transcript
+        start_bytes = self._sent_bytes - self._sent_audio_bytes
+        replay = list(self._sent_audio)
+        if self._header is not None and start_bytes > 0:
+            # The header chunk carries audio too, so the clock starts that much earlier
+            replay.insert(0, self._header)
+            start_bytes -= len(self._header)
+        self.set_asr_clock(start_bytes / self.audio.bytes_per_ms / 1000, self._heard_until)
+        self._replay_until = self._sent_bytes / self.audio.bytes_per_ms / 1000
+        self._attached_at = time.monotonic()
+        self._asr_stable = False
+        self.asr = backend
+        try:
+            for chunk in replay:
+                backend.send_audio(chunk)
+        except Exception as e:
+            print(f"💥 Failed to replay audio: {e}")
+        self._last_sent = time.monotonic()
+        self._asr_up.set()
+        return len(replay)
+
+    def on_control(self, data: dict) -> bool:
+        handler = self.control_handlers.get(data.get("type"))
+        if handler is None:
+            return False
+        if self.recorder is not None:
+            self.recorder.record("control", data=data)
+        handler(data)
+        return True
+
+    def on_pause(self, data: dict):
+        self.paused = True
+        print("⏸️ Received pause command.")
+
+    def on_resume(self, data: dict):
+        self.paused = False
+        held = self.paused_audio.drain()
+        for chunk in held:
+            self.audio.put_nowait(chunk, pin=chunk is self._header)
+        print(f"▶️ Received resume command, flushing {len(held)} held chunks.")
+
+    async def _keep_alive(self):
+        # Keeps the upstream open while no audio is forwarded (paused, or silence gated by the VAD)
+        while True:
+            await asyncio.sleep(ASR_KEEPALIVE_SECONDS / 2)
+            if self._asr_up.is_set() and time.monotonic() - self._last_sent >= ASR_KEEPALIVE_SECONDS:
+                self._last_sent = time.monotonic()
+                try:
+                    self.asr.keep_alive()
+                except Exception as e:
+                    print(f"💥 Failed to send keep-alive: {e}")
+
+    def on_format(self, data: dict):
+        # {"type": "format", "encoding": "linear16", "sample_rate": 48000, "channels": 2}
+        if self.asr is not None or self._connect_task is not None:
+            self.writer.send({"type": "error", "message": "Audio format must be declared before the script"})
+            return
+
+        encoding = data.get("encoding")
+        sample_rate = int(data.get("sample_rate", TARGET_SAMPLE_RATE))
+        channels = int(data.get("channels", 1))
+        if encoding != "linear16":
+            self.writer.send({"type": "error", "message": f"Unsupported audio encoding: {encoding}"})
+            return
+
+        self.converter = None
+        if PCM_DOWNMIX and (channels > 1 or sample_rate > TARGET_SAMPLE_RATE):
+            self.converter = PCMConverter(sample_rate, channels, min(sample_rate, TARGET_SAMPLE_RATE))
+            sample_rate, channels = self.converter.target_rate, 1
+
+        # What goes upstream, after conversion
+        self.format = {"encoding": encoding, "sample_rate": sample_rate, "channels": channels}
+        self.audio.bytes_per_ms = self.paused_audio.bytes_per_ms = sample_rate * channels * 2 // 1000
+        if VAD_ENABLED:
+            self.vad = EnergyVAD(sample_rate, channels)
+        self.writer.send({"type": "format", **self.format, "vad": self.vad is not None})
+        print(f"🎚️ Audio format: {self.format}, converted: {self.converter is not None}, VAD {'on' if self.vad else 'off'}")
+
+    def on_resync(self, data: dict):
+        if self.feedback is not None:
+            self.feedback.request_snapshot()
+            self.writer.notify_feedback()
+            print("🔁 Resync snapshot requested.")
+
+    # ASR results
+
+    def set_asr_clock(self, time_offset: float, dedupe_until: float):
+        # Recorded so a replay of the session maps and drops the new connection's results the same way
+        if self.recorder is not None:
+            self.recorder.record("reconnect", time_offset=time_offset, dedupe_until=dedupe_until)
+        self._time_offset = time_offset
+        self._dedupe_until = dedupe_until
+
+    def on_transcript(self, transcript, **kwargs):
+        if self.recorder is not None:
+            self.recorder.record("asr", r=transcript)
+        # Still aligned while paused: audio is gated before it goes upstream, so any
+        # result arriving now is for speech from before the pause (often its final)
+
+        if "channel" not in transcript:
+            return  # stream metadata, nothing to align
+
+        alternative = transcript.get("channel", {}).get("alternatives", [{}])[0]
+        entries = alternative.get("words")
+        if entries:
+            # Already tokenized, with timing and confidence per word
+            words = [w.get("punctuated_word") or w["word"] for w in entries]
+            confidences = [w.get("confidence") for w in entries]
+            # On the session's audio clock, which continues across reconnects
+            times = [w.get("end", 0.0) + self._time_offset for w in entries]
+            if self._dedupe_until is not None and times[0] <= self._dedupe_until + _REPLAY_TOLERANCE:
+                # Replayed audio that was already recognized before the reconnect
+                keep = next((i for i, t in enumerate(times) if t > self._dedupe_until + _REPLAY_TOLERANCE), len(times))
+                words, confidences, times = words[keep:], confidences[keep:], times[keep:]
+                if not words:
+                    return
+        else:
+            words = alternative.get("transcript", "").split()
+            confidences = times = None
+        if not times or times[-1] > self._replay_until:
+            self._asr_stable = True  # recognizing live audio, not just the replay
+        is_final = transcript.get("is_final", False) or transcript.get("speech_final", False)
+        if self._stale_words:
+            words = words[self._stale_words:]
+            if entries:
+                confidences, times = confidences[self._stale_words:], times[self._stale_words:]
+            if is_final:
+                self._stale_words = 0
+
+        if is_final and times:
+            self._heard_until = times[-1]
+            # How far recognition trails the audio sent, in seconds of audio
+            self._record_lag(self._sent_bytes / self.audio.bytes_per_ms / 1000 - times[-1])
+
+        # Interims only move provisional highlighting; finals commit to the session progress
+        update = self.aligner.update(words, final=is_final, confidences=confidences, times=times)
+        if update is None:
+            return  # identical to the previous interim
+
+        print("🎧 ASR words:", words, "(final)" if is_final else "(interim)")
+        # The writer builds the delta when it is ready to send, so bursts coalesce
+        self.writer.notify_feedback()
+
+    def _record_lag(self, lag: float):
+        self._lag_max = lag if not self._lags else max(self._lag_max, lag)
+        self._lags += 1
+        self._lag_total += lag
+
+    def reconnect_stats(self) -> dict:
+        return {
+            "reconnects": self.reconnects,
+            "total_gap_ms": round(1000 * self._gap_total),
+            "max_gap_ms": round(1000 * self._gap_max),
+        }
+
+    def lag_stats(self) -> dict:
+        return {
+            "finals": self._lags,
+            "avg_lag_ms": round(1000 * self._lag_total / self._lags) if self._lags else 0,
+            "max_lag_ms": round(1000 * self._lag_max),
+        }
+
+    # Teardown
+
+    async def close(self):
+        if self.aligner is not None:
+            print(f"📈 Alignment: {self.aligner.stats()}")
+        print(f"⏱️ ASR lag: {self.lag_stats()}")
+        if self.reconnects:
+            print(f"🔌 ASR reconnects: {self.reconnect_stats()}")
+        print(f"🧠 Phonetic cache: {phonetic_cache.stats()}")
+        print(f"📤 Outbound: {self.writer.stats()}")
+        print(f"🎙️ Audio buffer: {self.audio.stats()}")
+        if self.vad is not None:
+            print(f"🤫 VAD: {self.vad.stats()}")
+        print(f"⏸️ Withheld while paused: {self.paused_audio.stats()['dropped_ms']} ms")
+        await self.writer.close()
+        for task in list(self._background):
+            task.cancel()
+        if self._audio_task is not None:
+            self._audio_task.cancel()
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+        if self._supervise_task is not None:
+            self._supervise_task.cancel()
+        if self.asr is not None:
+            print(f"🗣️ ASR: {self.asr.stats()}")
+            await self.asr.finish()
+            print("🔚 ASR connection closed")
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.websocket.client_state == WebSocketState.CONNECTED:
+            await self.websocket.close()
+            print("🔒 WebSocket connection closed")
+        else:
+            print("⚠️ WebSocket was already closed")